@@ -1,5 +1,18 @@
+# Standard library imports
+import math
+
+# External library imports
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the CV matrix falls back to lists of floats without it
+    np = None
+
 # Local imports
 from month_generator import generate_months
+from report_common.formats import compile_formatters, format_row
+
+# The formatters of the columns: the CV of every month and the target are drawn with two decimals
+_FORMATTERS = compile_formatters(16, range(3, 16))
 
 
 def json_data_extract(data):
@@ -8,22 +21,41 @@ def json_data_extract(data):
     :param data: a JSON file
     :return: a list of lists where each element is a row of data
     """
-    outer_list = []
+    return list(iter_rows(data))
+
+
+def iter_rows(data):
+    """
+    Generates the rows of the table one at a time, as the layout engine pulls them, so no list of all the rows is built
+    :param data: a JSON file
+    :return: a generator of rows, each a list of cells
+    """
+    return (row for row, cvs, target in _iter_levels(data))
+
+
+def _iter_levels(data):
+    """
+    Generates the rows of the table together with the raw values they are drawn from
+    :param data: a JSON file
+    :return: a generator of (row, CVs, target): the formatted row, the CV of every month and the target of the level
+    """
+    empty = True
     layer1 = data.get("cvDataList", "")
-    tests = len(layer1)
     months = generate_months(data["startDateStr"])
-    format_index = [3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15]
 
-    for i in range(tests):
+    # The slot of every month of the report in the row, looked up once per CV instead of comparing against every month
+    month_slots = {month: slot for slot, month in enumerate(months)}
+
+    for test in layer1:
         inner_list = []
         first = True
-        layer2 = layer1[i].get("levelData", "")
+        layer2 = test.get("levelData", "")
         details = len(layer2)
 
         for j in range(details):
             # Add the two values only on the first occurrence of the test. Every other instance needs to be empty
             if first:
-                inner_list.append(layer1[i].get("analytesName", ""))
+                inner_list.append(test.get("analytesName", ""))
                 inner_list.append("")
             else:
                 inner_list.append("")
@@ -32,37 +64,136 @@ def json_data_extract(data):
             # Extracted using the get method to handle missing keys
             inner_list.append(layer2[j].get("level", ""))
 
-            layer3 = layer2[j].get("dataList", "")
-            cvs = len(layer3)
-            for month in months:
-                appended = False
-                for k in range(cvs):
-                    if layer3[k]["yearMonth"] == month:
-                        inner_list.append(layer3[k].get("cv"))
-                        appended = True
-                if not appended:
-                    inner_list.append("")
-
-            inner_list.append(layer1[i].get("target", ""))
-
-            formatted_list = []
-            for idx in range(len(inner_list)):
-                value = inner_list[idx]
-                if idx in format_index:
-                    if isinstance(value, (int, float)):
-                        formatted_value = "{:.2f}".format(value)
-                        formatted_list.append(formatted_value)
-                    else:
-                        formatted_list.append(value)
-                else:
-                    formatted_list.append(value)
-
-            outer_list.append(formatted_list)
+            cvs = _month_cvs(layer2[j], month_slots)
+            inner_list.extend(cvs)
+
+            target = test.get("target", "")
+            inner_list.append(target)
+
+            yield format_row(inner_list, _FORMATTERS), cvs, target
+            empty = False
             inner_list = []
             first = False
 
-    if not outer_list:
+    if empty:
         for i in range(2):
-            outer_list.append([""]*16)
+            yield [""]*16, [""]*len(months), ""
+
+
+def _month_cvs(level, month_slots):
+    """
+    Puts the CVs of a level in one slot per month, left empty for the months without data. Months outside the report
+    are ignored, and when a month is given more than once, the last CV wins
+    :param level: the level data
+    :param month_slots: the slot of every month of the report
+    :return: a list with the CV of every month
+    """
+    cv_slots = [""] * len(month_slots)
+    for point in level.get("dataList", ""):
+        slot = month_slots.get(point.get("yearMonth"))
+        if slot is not None:
+            cv_slots[slot] = point.get("cv")
+    return cv_slots
+
+
+class CvMatrix:
+    """
+    The CVs of the yearly report as numbers: a levels x months matrix, NaN where a month has no CV, and the target of
+    every level. The rows are the levels in the order of the table. Backed by NumPy arrays when NumPy is installed,
+    by lists of floats otherwise
+    """
+
+    def __init__(self, cvs, targets):
+        """
+        :param cvs: the CV of every level and month
+        :param targets: the target of every level
+        """
+        self.cvs = cvs
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.targets)
+
+    def exceedance(self):
+        """
+        Compares every CV with the target of its level, over the whole matrix at once
+        :return: two levels x months boolean masks: the CVs that were compared with a target, and the CVs above it
+        """
+        if np is not None:
+            compared = ~np.isnan(self.cvs) & ~np.isnan(self.targets)[:, None]
+            return compared, compared & (self.cvs > self.targets[:, None])
+
+        compared = [[not (math.isnan(cv) or math.isnan(target)) for cv in row]
+                    for row, target in zip(self.cvs, self.targets)]
+        above = [[is_compared and cv > target for cv, is_compared in zip(row, row_compared)]
+                 for row, target, row_compared in zip(self.cvs, self.targets, compared)]
+        return compared, above
+
+
+class CvRows:
+    """
+    The rows of the table, read in a single pass over the data as the layout engine pulls them. The CVs and the target
+    of every row pulled are kept as numbers only until the page holding the row is styled, so the exceedance of a page
+    is computed from the rows of that page. The data itself is read as it is given, i.e. the whole projected payload of
+    ingest.load_payload
+    """
+
+    def __init__(self, data):
+        """
+        :param data: a JSON file
+        """
+        self._levels = _iter_levels(data)
+        self._months = len(generate_months(data["startDateStr"]))
 
-    return outer_list
+        # The numbers of the rows pulled and not styled yet, starting at row self._start of the table
+        self._start = 0
+        self._cvs = []
+        self._targets = []
+
+    def __iter__(self):
+        for row, cvs, target in self._levels:
+            self._cvs.append([_drawn_number(cv) for cv in cvs])
+            self._targets.append(_drawn_number(target))
+            yield row
+
+    def exceedance(self, start, stop):
+        """
+        Compares the CVs of a page with their targets. The pages are styled in order, so the numbers of the rows up
+        to the end of the page are dropped afterwards
+        :param start: the first row of the page
+        :param stop: one past the last row of the page
+        :return: the exceedance masks of the rows of the page, as given by CvMatrix.exceedance
+        """
+        lo, hi = start - self._start, stop - self._start
+        masks = _cv_matrix(self._cvs[lo:hi], self._targets[lo:hi], self._months).exceedance()
+
+        del self._cvs[:hi], self._targets[:hi]
+        self._start = stop
+        return masks
+
+
+def _cv_matrix(cvs, targets, months):
+    """
+    Builds a CvMatrix from the numbers of its rows
+    :param cvs: the CV of every level and month
+    :param targets: the target of every level
+    :param months: the number of months of the report
+    :return: a CvMatrix
+    """
+    if np is not None:
+        return CvMatrix(np.array(cvs, dtype=float).reshape(len(cvs), months), np.array(targets, dtype=float))
+    return CvMatrix(cvs, targets)
+
+
+def _drawn_number(value):
+    """
+    Reads a cell as the number it is drawn as
+    :param value: the raw value of the cell
+    :return: the number, or NaN if the cell isn't drawn as a number
+    """
+    if isinstance(value, (int, float)):
+        return round(float(value), 2)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
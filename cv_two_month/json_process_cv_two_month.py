@@ -1,93 +1,225 @@
+# Standard library imports
+import math
+from functools import lru_cache
+
+# Local imports
+from report_common.formats import compile_formatters, format_row
+
+# The number of months compared by the report
+_COMPARED_MONTHS = 2
+
+
 # Extracts the information from the json file and returns a list that can be expressed in a table
 def json_data_extract(data):
     """
     Generates a formatted list suitable for ReportLab's table generation method
     :param data: a JSON file
-    :return: a list of lists where each element is a row of data
-    """
-    outer_list = []
-    layer1 = data.get("projectMonthDataList", "")
-    tests = len(layer1)
-    format_index = [2, 3, 5, 6, 10, 11]
-    lev_list = data.get("levelList", "")
-    lev_len = len(lev_list)
-    month_list = []
-
-    for i in range(tests):
-        inner_list = []
-        first = True
-        layer2 = layer1[i].get("monthDataList", "")
-        details = len(layer2)
+    :return: a list of lists where each element is a row of data, and the months of the report
+    """
+    return list(iter_rows(data)), month_list(data)
+
+
+def month_list(data):
+    """
+    Lists the months of the report in chronological order. A level missing the first month doesn't change the order
+    :param data: a JSON file
+    :return: a list of yearMonth values
+    """
+    # A dict is an ordered set: the months already seen are found without scanning them
+    months = {}
+    for test in data.get("projectMonthDataList", ""):
+        for level in test.get("monthDataList", ""):
+            for month_data in level.get("monthData", ""):
+                months[month_data.get("yearMonth", "")] = None
+
+    # yyyy-mm sorts chronologically as text
+    return sorted(months, key=str)
+
+
+def iter_rows(data):
+    """
+    Generates the rows of the table one at a time, as the layout engine pulls them
+    :param data: a JSON file
+    :return: a generator of rows, each a list of cells
+    """
+    return compare_months(data).rows()
 
-        for j in range(details):
-            # Add the two values only on the first occurrence of the test. Every other instance needs to be empty
-            if first:
-                inner_list.append(layer1[i].get("analytesName", ""))
-            else:
-                inner_list.append("")
+
+def compare_months(data, months=_COMPARED_MONTHS):
+    """
+    Aligns the data of every level on the months of the report and compares every month with the one before
+    :param data: a JSON file
+    :param months: the number of months compared, from the first month of the report
+    :return: a MonthComparison
+    """
+    compared = month_list(data)[:months]
+    month_slots = {month: slot for slot, month in enumerate(compared)}
+
+    labels, levels, targets, slots = [], [], [], []
+    for test in data.get("projectMonthDataList", ""):
+        first = True
+        for level in test.get("monthDataList", ""):
+            # Add the name only on the first occurrence of the test. Every other instance needs to be empty
+            labels.append(test.get("analytesName", "") if first else "")
 
             # Extracted using the get method to handle missing keys
-            inner_list.append(str(layer2[j].get("level", "")))
-            layer3 = layer2[j].get("monthData", "")
-            details3 = len(layer3)
-
-            if details3 > 0:
-                for idx in range(details3):
-                    month = layer3[idx].get("yearMonth", "")
-                    if month not in month_list:
-                        month_list.append(month)
-                    inner_list.append(layer3[idx].get("mean", ""))
-                    inner_list.append(layer3[idx].get("cv", ""))
-                    inner_list.append(str(layer3[idx].get("dataCount", "")))
-
-            else:
-                inner_list.append("")
-                inner_list.append("")
-                inner_list.append("")
-                inner_list.append("")
-                inner_list.append("")
-                inner_list.append("")
-
-            if inner_list[5] != '' and inner_list[2] != '':
-                mean_diff = ((inner_list[5] - inner_list[2])/inner_list[2])*100
-                mean_diff = f'{mean_diff:.2f}%'
-            else:
-                mean_diff = ''
-            inner_list.append(mean_diff)
-
-            if inner_list[6] != '' and inner_list[3] != '':
-                cv_diff = ((inner_list[6] - inner_list[3])/inner_list[3])*100
-                cv_diff = f'{cv_diff:.2f}%'
-            else:
-                cv_diff = ''
-            inner_list.append(cv_diff)
-
-            if lev_len == 1:
-                if inner_list[6] != '' and inner_list[3] != '':
-                    cvr = inner_list[3]/inner_list[6]
-                else:
-                    cvr = ''
-                inner_list.append(cvr)
-
-            inner_list.append(layer2[j].get("target", ""))
-            formatted_list = []
-            for idx in range(len(inner_list)):
-                value = inner_list[idx]
-                if idx in format_index:
-                    if isinstance(value, (int, float)):
-                        formatted_value = "{:.2f}".format(value)
-                        formatted_list.append(formatted_value)
-                    else:
-                        formatted_list.append(value)
-                else:
-                    formatted_list.append(value)
-
-            outer_list.append(formatted_list)
-            inner_list = []
+            levels.append(str(level.get("level", "")))
+            slots.append(_month_slots(level, month_slots, months))
+            targets.append(level.get("target", ""))
             first = False
-            
-    if not outer_list:
-        for i in range(2):
-            outer_list.append([""]*11)
 
-    return outer_list, month_list
+    return MonthComparison(compared, months, labels, levels, slots, targets, len(data.get("levelList", "")) == 1)
+
+
+def _month_slots(level, month_slots, months):
+    """
+    Aligns the data of a level on the months of the report, one (mean, CV, data count) slot per month. A month without
+    data is left empty, months after the compared ones are ignored, and when a month is given more than once, the last
+    one wins
+    :param level: the level data
+    :param month_slots: the slot of every compared month
+    :param months: the number of months compared
+    :return: a list with the mean, CV and data count of every compared month
+    """
+    slots = [("", "", "")] * months
+    for month_data in level.get("monthData", ""):
+        slot = month_slots.get(month_data.get("yearMonth", ""))
+        if slot is not None:
+            slots[slot] = (month_data.get("mean", ""), month_data.get("cv", ""),
+                           str(month_data.get("dataCount", "")))
+    return slots
+
+
+class MonthComparison:
+    """
+    The data of the report aligned on its months, one row per level. The values of every month are kept as they are,
+    to be drawn, and the differences between consecutive months are computed over whole columns and kept as numbers,
+    NaN where they can't be computed, until the rows are drawn
+    """
+
+    def __init__(self, months, n_months, labels, levels, slots, targets, single_level):
+        """
+        :param months: the compared months found in the data. There may be fewer than n_months
+        :param n_months: the number of months compared
+        :param labels: the analyte name of every row, empty for the rows after the first of an analyte
+        :param levels: the level of every row
+        :param slots: the (mean, CV, data count) of every month, for every row
+        :param targets: the target of every row
+        :param single_level: True if the report has a single level, which adds the CVR to the comparisons
+        """
+        self.months = months
+        self.n_months = n_months
+        self.labels = labels
+        self.levels = levels
+        self.targets = targets
+        self.single_level = single_level
+
+        # The columns of every month: means[month][row], and so on
+        self.means = [[row[month][0] for row in slots] for month in range(n_months)]
+        self.cvs = [[row[month][1] for row in slots] for month in range(n_months)]
+        self.counts = [[row[month][2] for row in slots] for month in range(n_months)]
+
+        # The comparison of every month with the one before: mean_diffs[0] compares the second month with the first
+        means = [_numbers(column) for column in self.means]
+        cvs = [_numbers(column) for column in self.cvs]
+        self.mean_diffs = [_percent_changes(before, after) for before, after in zip(means, means[1:])]
+        self.cv_diffs = [_percent_changes(before, after) for before, after in zip(cvs, cvs[1:])]
+        self.cvrs = [_ratios(before, after) for before, after in zip(cvs, cvs[1:])] if single_level else []
+
+    def __len__(self):
+        return len(self.levels)
+
+    def rows(self):
+        """
+        Builds the display rows one at a time: the analyte and level, the mean, CV and data count of every month, the
+        mean differences, the CV differences, the CVRs of a single level report, and the target
+        :return: a generator of rows, each a list of cells
+        """
+        formatters = _formatters(self.n_months, self.single_level)
+        for row in range(len(self)):
+            cells = [self.labels[row], self.levels[row]]
+            for month in range(self.n_months):
+                cells.extend([self.means[month][row], self.cvs[month][row], self.counts[month][row]])
+            cells.extend(_percent(diffs[row]) for diffs in self.mean_diffs)
+            cells.extend(_percent(diffs[row]) for diffs in self.cv_diffs)
+            cells.extend(_number(cvrs[row]) for cvrs in self.cvrs)
+            cells.append(self.targets[row])
+            yield format_row(cells, formatters)
+
+        if not len(self):
+            for i in range(2):
+                yield [""] * _width(self.n_months, False)
+
+
+def _width(months, single_level):
+    """
+    Counts the columns of the table
+    :param months: the number of months compared
+    :param single_level: True if the CVR columns are drawn
+    :return: the number of columns
+    """
+    return 2 + 3 * months + (months - 1) * (3 if single_level else 2) + 1
+
+
+@lru_cache(maxsize=None)
+def _formatters(months, single_level):
+    """
+    Compiles the formatters of the table. The means and CVs of every month, the CVRs and the target are drawn with two
+    decimals
+    :param months: the number of months compared
+    :param single_level: True if the CVR columns are drawn
+    :return: the compiled formatters
+    """
+    width = _width(months, single_level)
+    decimal_cols = [2 + 3 * month + offset for month in range(months) for offset in (0, 1)]
+    if single_level:
+        decimal_cols.extend(range(2 + 3 * months + 2 * (months - 1), width - 1))
+    decimal_cols.append(width - 1)
+    return compile_formatters(width, decimal_cols)
+
+
+def _numbers(column):
+    """
+    Reads a column as numbers
+    :param column: the raw values
+    :return: a list of floats, NaN where the value isn't a number
+    """
+    return [float(value) if isinstance(value, (int, float)) else math.nan for value in column]
+
+
+def _percent_changes(before, after):
+    """
+    Computes the change in percent between two columns
+    :param before: the earlier column
+    :param after: the later column
+    :return: a list of the changes, NaN where either value is missing or the earlier one is zero
+    """
+    return [((b - a) / a) * 100 if a else math.nan for a, b in zip(before, after)]
+
+
+def _ratios(before, after):
+    """
+    Divides a column by another
+    :param before: the earlier column
+    :param after: the later column
+    :return: a list of the ratios, NaN where either value is missing or the later one is zero
+    """
+    return [a / b if b else math.nan for a, b in zip(before, after)]
+
+
+def _percent(value):
+    """
+    Draws a change in percent
+    :param value: the change
+    :return: the display string, empty if the change couldn't be computed
+    """
+    return "" if math.isnan(value) else f"{value:.2f}%"
+
+
+def _number(value):
+    """
+    Draws a computed number. It is formatted with the rest of the decimal columns
+    :param value: the number
+    :return: the number, or an empty string if it couldn't be computed
+    """
+    return "" if math.isnan(value) else value
@@ -1,3 +1,10 @@
+# Local imports
+from report_common.formats import compile_formatters, format_row
+
+# The formatters of the columns: the point value, mean, SD and z-score are drawn with two decimals
+_FORMATTERS = compile_formatters(10, [3, 4, 5, 6])
+
+
 # Extracts the information from the json file and returns a list that can be expressed in a table
 def json_data_extract(data):
     """
@@ -5,21 +12,28 @@ def json_data_extract(data):
     :param data: a JSON file
     :return: a list of lists where each element is a row of data
     """
-    outer_list = []
+    return list(iter_rows(data))
+
+
+def iter_rows(data):
+    """
+    Generates the rows of the table one at a time, as the layout engine pulls them, so no list of all the rows is built
+    :param data: a JSON file
+    :return: a generator of rows, each a list of cells
+    """
+    empty = True
     layer1 = data.get("projectDataList", "")
-    tests = len(layer1)
-    format_index = [3, 4, 5, 6]
 
-    for i in range(tests):
+    for test in layer1:
         inner_list = []
         first = True
-        layer2 = layer1[i].get("pointDataList", "")
+        layer2 = test.get("pointDataList", "")
         details = len(layer2)
 
         for j in range(details):
             # Add the two values only on the first occurrence of the test. Every other instance needs to be empty
             if first:
-                inner_list.append(layer1[i].get("analytesName", ""))
+                inner_list.append(test.get("analytesName", ""))
             else:
                 inner_list.append("")
 
@@ -59,24 +73,11 @@ def json_data_extract(data):
             formatted_string = f"{spc_rule}, {' // '.join(formatted_logs)} // {remark}"
             inner_list.append(formatted_string)
 
-            formatted_list = []
-            for idx in range(len(inner_list)):
-                value = inner_list[idx]
-                if idx in format_index:
-                    if isinstance(value, (int, float)):
-                        formatted_value = "{:.2f}".format(value)
-                        formatted_list.append(formatted_value)
-                    else:
-                        formatted_list.append(value)
-                else:
-                    formatted_list.append(value)
-
-            outer_list.append(formatted_list)
+            yield format_row(inner_list, _FORMATTERS)
+            empty = False
             inner_list = []
             first = False
 
-    if not outer_list:
+    if empty:
         for i in range(2):
-            outer_list.append([""]*10)
-
-    return outer_list
+            yield [""]*10
@@ -0,0 +1,155 @@
+# Standard library imports
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Local imports
+from report_common.reports import REPORT_TYPES, prepare_worker, render_report
+
+
+class AsyncRenderer:
+    """
+    Renders reports from asyncio code. The blocking pdf_gen calls, font loading included, run on a process or thread
+    pool, and at most max_concurrency reports are rendered at the same time. Further calls wait for a free slot.
+    """
+
+    def __init__(self, max_concurrency=None, executor="process", workers=None):
+        """
+        :param max_concurrency: the number of reports rendered at the same time. Defaults to the number of workers
+        :param executor: "process" to render on worker processes, "thread" to render on threads of this process. The
+        threads share the fonts and measurement caches but run one at a time under the GIL
+        :param workers: the number of workers. Defaults to the number of cores
+        """
+        if executor not in ("process", "thread"):
+            raise ValueError(f"Unknown executor {executor!r}, expected 'process' or 'thread'")
+        self.executor = executor
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.workers
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._semaphore = None
+        self._loop = None
+
+    async def render(self, report_type, payload, output=bytes):
+        """
+        Renders a report. Cancelling the call cancels the job if it hasn't started yet. A job that has started runs to
+        the end in the background, keeping its slot until then, and its result is dropped
+        :param report_type: one of REPORT_TYPES
+        :param payload: the quality control data of the report
+        :param output: where to write the pdf, as taken by pdf_gen. Defaults to returning the pdf bytes. File-like
+        objects can only be used with the thread executor
+        :return: what pdf_gen returns for the output
+        """
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Unknown report type {report_type!r}, expected one of {', '.join(REPORT_TYPES)}")
+        if self.executor == "process" and hasattr(output, "write"):
+            raise TypeError("File-like outputs can't be sent to worker processes, use a path or bytes")
+
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        try:
+            future = self._get_executor().submit(render_report, report_type, payload, output)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        # The slot is given back when the worker is done with the job, not when the caller stops waiting
+        loop = asyncio.get_running_loop()
+
+        def release(f):
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                # The event loop is closed, and the semaphore with it
+                pass
+
+        future.add_done_callback(release)
+
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    async def warm_up(self):
+        """
+        Starts the workers and loads the fonts ahead of the first report
+        :return:
+        """
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        if self.executor == "process":
+            await asyncio.gather(*[loop.run_in_executor(executor, _ping) for _ in range(self.workers)])
+        else:
+            await loop.run_in_executor(executor, prepare_worker)
+
+    async def aclose(self):
+        """
+        Stops the workers once the running jobs are done, without blocking the event loop
+        :return:
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _get_executor(self):
+        """
+        Creates the pool of workers on first use
+        :return: the executor
+        """
+        with self._lock:
+            if self._executor is None:
+                if self.executor == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=prepare_worker)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report")
+            return self._executor
+
+    def _get_semaphore(self):
+        """
+        Gets the concurrency limit of the running event loop. A new loop, e.g. from another asyncio.run, gets a new one
+        :return: the semaphore
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+
+def _ping():
+    """
+    A job doing nothing, used to start the workers
+    :return:
+    """
+
+
+# The renderer used by render, created on first use
+_default_renderer = None
+
+
+async def render(report_type, payload, output=bytes, renderer=None):
+    """
+    Renders a report without blocking the event loop, on a shared pool of worker processes
+    :param report_type: one of REPORT_TYPES
+    :param payload: the quality control data of the report
+    :param output: where to write the pdf, as taken by pdf_gen. Defaults to returning the pdf bytes
+    :param renderer: the AsyncRenderer to use. Defaults to one with a process per core
+    :return: what pdf_gen returns for the output
+    """
+    global _default_renderer
+    if renderer is None:
+        if _default_renderer is None:
+            _default_renderer = AsyncRenderer()
+        renderer = _default_renderer
+
+    return await renderer.render(report_type, payload, output)
@@ -0,0 +1,207 @@
+# Standard library imports
+import argparse
+import glob
+import itertools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# Local imports
+from report_common.fonts import warm_up
+from report_common.ingest import load_payload
+from report_common.reports import REPORT_TYPES, load_report, render_report, page_count
+from report_common.timing import StageTimer
+
+
+def find_jobs(source):
+    """
+    Lists the payloads to render. The lines of an ndjson file are read one at a time, as the jobs are pulled
+    :param source: a directory of json files, a glob pattern (** matches nested folders), or an ndjson file
+    :return: an iterator of (name, path, line) jobs. line is the text of the payload for ndjson files, None otherwise
+    :raise ValueError: when two payloads would be written to the same pdf
+    """
+    if os.path.isfile(source) and source.endswith((".ndjson", ".jsonl")):
+        return _ndjson_jobs(source)
+
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "*.json")))
+    else:
+        paths = sorted(glob.glob(source, recursive=True))
+
+    return iter([(name, path, None) for name, path in zip(_output_names(paths), paths)])
+
+
+def _ndjson_jobs(source):
+    """
+    Reads the jobs of an ndjson file lazily, one line at a time
+    :param source: the ndjson file
+    :return: a generator of (name, path, line) jobs, named after the file and the line number
+    """
+    stem = os.path.splitext(os.path.basename(source))[0]
+    with open(source, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                yield f"{stem}-{number}", source, line
+
+
+def _output_names(paths):
+    """
+    Names the pdfs of the payload files after their file names. Files of the same name found in different folders, e.g.
+    by a recursive glob pattern, are named after their path relative to the folder they share instead
+    :param paths: the payload files
+    :return: the names of the pdfs, in the order of the paths
+    :raise ValueError: when two payloads would still be written to the same pdf
+    """
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    counts = Counter(stem.casefold() for stem in stems)
+    if all(count == 1 for count in counts.values()):
+        return stems
+
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    names = [stem if counts[stem.casefold()] == 1
+             else os.path.splitext(os.path.relpath(os.path.abspath(path), root))[0].replace(os.sep, "_")
+             for stem, path in zip(stems, paths)]
+
+    # Names are compared like a case-insensitive file system would
+    seen = {}
+    for name, path in zip(names, paths):
+        other = seen.setdefault(name.casefold(), path)
+        if other != path:
+            raise ValueError(f"{other} and {path} would both be written to {name}.pdf")
+    return names
+
+
+def _init_worker(report_type):
+    """
+    Prepares a worker process: the fonts are parsed and the report module imported once, before the first job
+    :param report_type: the report type rendered by the worker
+    :return:
+    """
+    warm_up()
+    load_report(report_type)
+
+
+def _render_job(report_type, job, out_dir):
+    """
+    Renders a single payload and writes the pdf. Errors are reported in the summary instead of stopping the batch
+    :param report_type: the report type
+    :param job: a (name, path, line) job
+    :param out_dir: the folder the pdf is written to
+    :return: the summary of the job
+    """
+    name, path, line = job
+    summary = {"name": name, "source": path, "output": None, "seconds": None, "pages": None, "stages": None,
+               "error": None}
+
+    start = time.perf_counter()
+    try:
+        # Only the fields read by the report are kept from the payload
+        payload = load_payload(path if line is None else line.encode("utf-8"), report_type)
+
+        timer = StageTimer()
+        pdf_bytes = render_report(report_type, payload, timer=timer)
+        output = os.path.join(out_dir, f"{name}.pdf")
+        with open(output, "wb") as f:
+            f.write(pdf_bytes)
+
+        summary["output"] = output
+        summary["pages"] = page_count(pdf_bytes)
+        summary["stages"] = {stage: round(result["seconds"], 4) for stage, result in timer.results().items()}
+    except Exception as e:
+        summary["error"] = f"{type(e).__name__}: {e}"
+    summary["seconds"] = round(time.perf_counter() - start, 4)
+
+    return summary
+
+
+def run_batch(report_type, jobs, out_dir, summary_file, workers=None):
+    """
+    Renders the jobs on a process pool and writes the summary of every job as it finishes. At most two jobs per worker
+    are handed to the pool at once, and the next ones are only pulled as jobs finish, so a long ndjson file is never
+    read ahead of the workers
+    :param report_type: one of REPORT_TYPES
+    :param jobs: an iterable of jobs, as listed by find_jobs
+    :param out_dir: the folder the pdfs are written to
+    :param summary_file: an open text file receiving one json line per job
+    :param workers: the number of worker processes. Defaults to the number of cores
+    :return: the number of jobs, and the number of failed jobs
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    window = 2 * (workers or os.cpu_count() or 1)
+
+    total = failed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(report_type,)) as executor:
+        pending = set()
+        for job in jobs:
+            pending.add(executor.submit(_render_job, report_type, job, out_dir))
+            total += 1
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                failed += _write_summaries(done, summary_file)
+        failed += _write_summaries(wait(pending).done, summary_file)
+
+    return total, failed
+
+
+def _write_summaries(futures, summary_file):
+    """
+    Writes the summaries of finished jobs
+    :param futures: the futures of the finished jobs
+    :param summary_file: an open text file receiving one json line per job
+    :return: the number of failed jobs among them
+    """
+    failed = 0
+    for future in futures:
+        summary = future.result()
+        failed += summary["error"] is not None
+        summary_file.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    summary_file.flush()
+    return failed
+
+
+def main(argv=None):
+    """
+    The command line entry point
+    :param argv: the command line arguments. Defaults to sys.argv
+    :return: the exit status, 1 if any job failed
+    """
+    parser = argparse.ArgumentParser(prog="python -m report_common.batch",
+                                     description="Render many reports of one type in parallel.")
+    parser.add_argument("report_type", choices=list(REPORT_TYPES))
+    parser.add_argument("source", help="a directory of json files, a glob pattern or an ndjson file")
+    parser.add_argument("--out", default=".", help="the folder the pdfs are written to (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=None, help="the number of worker processes (default: all cores)")
+    parser.add_argument("--summary", default=None,
+                        help="the file the per-job summary is written to (default: summary.ndjson in --out)")
+    args = parser.parse_args(argv)
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    try:
+        jobs = find_jobs(args.source)
+    except ValueError as e:
+        parser.error(str(e))
+    first = next(jobs, None)
+    if first is None:
+        parser.error(f"no payloads found in {args.source}")
+
+    os.makedirs(args.out, exist_ok=True)
+    summary_path = args.summary or os.path.join(args.out, "summary.ndjson")
+
+    start = time.perf_counter()
+    with open(summary_path, "w", encoding="utf-8") as summary_file:
+        total, failed = run_batch(args.report_type, itertools.chain([first], jobs), args.out, summary_file, args.jobs)
+    elapsed = time.perf_counter() - start
+
+    print(f"{total - failed} of {total} reports rendered in {elapsed:.1f}s, {failed} failed. "
+          f"Summary in {summary_path}", file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# Standard library imports
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+
+# External library imports
+from reportlab.lib.pagesizes import landscape, A4
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table
+
+# Local imports
+from report_common.display import display_rows
+from report_common.fonts import warm_up
+from report_common.layout import paginate
+from report_common.measure import clear_measure_cache
+from report_common.reports import REPORT_TYPES, load_report, render_report
+from report_common.synthetic import make_payload
+from report_common.timing import StageTimer
+
+# The number of analytes of every scale. The batch reports spread them over four lots
+SCALES = {"small": 5, "medium": 30, "large": 150}
+
+# The stages timed for every report type and scale, in the order they run in pdf_gen
+STAGES = ["extraction", "measurement", "measurement_warm", "pagination", "styling", "drawing", "save", "total"]
+
+
+def scale_payload(report_type, scale, seed=0):
+    """
+    Generates the payload of a report type at a benchmark scale
+    :param report_type: one of REPORT_TYPES
+    :param scale: one of SCALES
+    :param seed: the seed of the payload generator
+    :return: the payload
+    """
+    analytes = SCALES[scale]
+    if report_type.endswith("_batch"):
+        return make_payload(report_type, seed, batches=4, analytes=max(analytes // 4, 1))
+    return make_payload(report_type, seed, analytes=analytes)
+
+
+class _Captured(Exception):
+    """
+    Stops a report once its table has been captured
+    """
+
+
+def _capture_table(report_type, payload):
+    """
+    Runs a report up to its table and keeps what pdf_gen hands to the layout engine, so the stages can be timed one by
+    one. The report stops there, so its page styler, which may read the row source as the pages go, hasn't styled any
+    page yet
+    :param report_type: one of REPORT_TYPES
+    :param payload: the payload of the report
+    :return: a dict with the module, the TableSpec, the rows, the frame, the table top and the header rows of the table
+    """
+    module = load_report(report_type)
+    draw_table = module.draw_table
+    captured = {"module": module}
+
+    def capture(pdf, spec, rows, frame, table_top, header_rows=0, timer=None):
+        rows = list(rows)
+        captured.update(spec=spec, rows=rows, frame=frame, table_top=table_top, header_rows=header_rows)
+        raise _Captured
+
+    module.draw_table = capture
+    try:
+        render_report(report_type, payload)
+    except _Captured:
+        pass
+    finally:
+        module.draw_table = draw_table
+
+    return captured
+
+
+def _extract_rows(module, payload):
+    """
+    Extracts and formats the rows of a report, as pdf_gen does
+    :param module: the report module
+    :param payload: the payload of the report
+    :return: the list of the display rows
+    """
+    if hasattr(module, "column_store"):
+        return list(module.column_store(payload).rows())
+    if hasattr(module, "compare_months"):
+        return list(module.compare_months(payload).rows())
+    if hasattr(module, "CvRows"):
+        return list(module.CvRows(payload))
+    return list(module.iter_rows(payload))
+
+
+def _median_time(run, repeat, setup=None):
+    """
+    Times a stage
+    :param run: the stage, taking what setup returns
+    :param repeat: the number of runs
+    :param setup: prepares every run, outside of the timing. Optional
+    :return: the median time in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        run(arg)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _paginate(spec, rows, header_rows):
+    """
+    Lays the rows of a table out on pages like draw_table does, without drawing them
+    :param spec: the TableSpec of the table
+    :param rows: the rows of the table
+    :param header_rows: the number of rows the header box takes from the first page
+    :return: the seconds spent measuring the rows, the seconds spent on the rest of the pagination, and the pages
+    """
+    timer = StageTimer()
+    timer.start()
+    start = time.perf_counter()
+    pages = [page for kind, page in paginate(spec, rows, header_rows, timer)[1]]
+    elapsed = time.perf_counter() - start
+
+    measurement = timer.results().get("measurement", {"seconds": 0.0})["seconds"]
+    return measurement, elapsed - measurement, pages
+
+
+def bench_report(report_type, scale, repeat=5):
+    """
+    Times every stage of a report type
+    :param report_type: one of REPORT_TYPES
+    :param scale: one of SCALES
+    :param repeat: the number of runs of every stage
+    :return: a dict with the median time in seconds of every stage
+    """
+    payload = scale_payload(report_type, scale)
+    table = _capture_table(report_type, payload)
+    module, spec, rows = table["module"], table["spec"], table["rows"]
+    frame, table_top, header_rows = table["frame"], table["table_top"], table["header_rows"]
+
+    # The rows are measured and paginated by the stream of rows of draw_table, with a cold and a warm measure cache
+    cold = []
+    for _ in range(repeat):
+        clear_measure_cache()
+        cold.append(_paginate(spec, rows, header_rows))
+    warm = [_paginate(spec, rows, header_rows) for _ in range(repeat)]
+    pages = warm[-1][2]
+
+    def fresh_spec(_=None):
+        # Every run styles the pages once, in order, with the page styler of a new run of the report
+        return _capture_table(report_type, payload)["spec"]
+
+    def page_tables(_=None):
+        tables = []
+        for page in pages:
+            page_table = Table(display_rows(page.rows, spec.wrapped_cols, spec.paragraph_style),
+                               colWidths=spec.col_widths, rowHeights=page.row_index.row_heights(page.start, page.stop))
+            page_table.setStyle(spec.style)
+            tables.append((page_table, page))
+        return fresh_spec().page_styler, tables
+
+    def style_pages(styled):
+        page_styler, tables = styled
+        if page_styler is not None:
+            for page_table, page in tables:
+                page_styler(page_table, page)
+
+    def new_canvas(_=None):
+        return canvas.Canvas(io.BytesIO(), pagesize=landscape(A4))
+
+    def drawing_setup(_=None):
+        return new_canvas(), fresh_spec()
+
+    def drawn_canvas(_=None):
+        pdf = new_canvas()
+        module.draw_table(pdf, fresh_spec(), rows, frame, table_top, header_rows)
+        return pdf
+
+    return {
+        "extraction": _median_time(lambda _: _extract_rows(module, payload), repeat),
+        "measurement": statistics.median(measurement for measurement, pagination, pages in cold),
+        "measurement_warm": statistics.median(measurement for measurement, pagination, pages in warm),
+        "pagination": statistics.median(pagination for measurement, pagination, pages in warm),
+        "styling": _median_time(style_pages, repeat, setup=page_tables),
+        "drawing": _median_time(lambda setup: module.draw_table(*setup, rows, frame, table_top, header_rows), repeat,
+                                setup=drawing_setup),
+        "save": _median_time(lambda pdf: pdf.save(), repeat, setup=drawn_canvas),
+        "total": _median_time(lambda _: render_report(report_type, payload), repeat),
+    }
+
+
+def main(argv=None):
+    """
+    The command line entry point. Run it where the font files are found, like the reports
+    :param argv: the command line arguments. Defaults to sys.argv
+    :return: the exit status
+    """
+    parser = argparse.ArgumentParser(prog="python -m report_common.bench",
+                                     description="Time every stage of the reports on synthetic payloads.")
+    parser.add_argument("--types", nargs="+", choices=list(REPORT_TYPES), default=list(REPORT_TYPES))
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES))
+    parser.add_argument("--repeat", type=int, default=5, help="the runs of every stage (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="print the results as json lines")
+    args = parser.parse_args(argv)
+
+    warm_up()
+    for report_type in args.types:
+        for scale in args.scales:
+            results = bench_report(report_type, scale, args.repeat)
+            if args.json:
+                print(json.dumps({"report_type": report_type, "scale": scale, "seconds": results}))
+                continue
+            for stage in STAGES:
+                print(f"{report_type:<15} {scale:<7} {stage:<17} {results[stage] * 1000:10.2f} ms")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
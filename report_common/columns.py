@@ -0,0 +1,179 @@
+# Standard library imports
+from array import array
+
+# The kinds of columns of a ColumnStore. Labels are kept as they are, decimals are drawn with two decimals and counts
+# are drawn as they are
+LABEL = "label"
+DECIMAL = "decimal"
+COUNT = "count"
+
+# The state of a cell of a numeric column, in its mask
+_PRESENT, _MISSING, _OTHER = 0, 1, 2
+
+# The range of a signed 64-bit array item
+_INT64 = 2 ** 63
+
+
+class ColumnStore:
+    """
+    Columnar store of the rows of a table. Label columns are lists, numeric columns are arrays of machine numbers with
+    a mask telling present, missing and other values apart, so a row costs a few bytes per number instead of a list of
+    Python objects. The display strings are only built when rows are read, so only the rows of the page being laid
+    out are ever formatted
+    """
+
+    def __init__(self, kinds, missing=""):
+        """
+        :param kinds: the kind of every column: LABEL, DECIMAL or COUNT
+        :param missing: the value of a missing cell, as given and as drawn
+        """
+        self.kinds = list(kinds)
+        self.missing = missing
+        self._columns = [[] if kind == LABEL else array("d" if kind == DECIMAL else "q") for kind in self.kinds]
+        self._masks = [None if kind == LABEL else bytearray() for kind in self.kinds]
+        self._appenders = [(column.append, None, None) if kind == LABEL else (column.append, mask.append, _FITS[kind])
+                           for kind, column, mask in zip(self.kinds, self._columns, self._masks)]
+
+        # The values of numeric columns that are neither numbers nor missing, e.g. text, by (column, row)
+        self._others = {}
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return self.rows()
+
+    def append(self, values):
+        """
+        Adds a row
+        :param values: the value of every column
+        :return:
+        """
+        row = self._len
+        for col, (append, mark, fits), value in zip(range(len(self.kinds)), self._appenders, values):
+            if fits is None:
+                append(value)
+            elif fits(value):
+                append(value)
+                mark(_PRESENT)
+            else:
+                append(0)
+                if isinstance(value, str) and value == self.missing:
+                    mark(_MISSING)
+                else:
+                    mark(_OTHER)
+                    self._others[(col, row)] = value
+        self._len += 1
+
+    def row(self, index):
+        """
+        Builds the display row of a row
+        :param index: the row
+        :return: a list with the display value of every column
+        """
+        return next(self.rows(index, index + 1))
+
+    def rows(self, start=0, stop=None, block=64):
+        """
+        Builds the display rows of a range of rows. The rows are formatted a block at a time, one column after the
+        other, and handed out one at a time
+        :param start: the first row
+        :param stop: one past the last row. Defaults to the end of the table
+        :param block: the number of rows formatted at once
+        :return: a generator of display rows
+        """
+        stop = self._len if stop is None else min(stop, self._len)
+        for block_start in range(start, stop, block):
+            block_stop = min(block_start + block, stop)
+            columns = [self._display_column(col, block_start, block_stop) for col in range(len(self.kinds))]
+            for row in zip(*columns):
+                yield list(row)
+
+    def _display_column(self, col, start, stop):
+        """
+        Formats the cells of a column
+        :param col: the column
+        :param start: the first row
+        :param stop: one past the last row
+        :return: a list with the display value of every row
+        """
+        kind = self.kinds[col]
+        values = self._columns[col][start:stop]
+        if kind == LABEL:
+            return values
+
+        display = [f"{value:.2f}" for value in values] if kind == DECIMAL else values.tolist()
+
+        # Put back the cells that aren't numbers
+        mask = self._masks[col]
+        if any(mask[start:stop]):
+            for index in range(start, stop):
+                state = mask[index]
+                if state == _MISSING:
+                    display[index - start] = self.missing
+                elif state == _OTHER:
+                    display[index - start] = self._others[(col, index)]
+        return display
+
+    def numbers(self, col, start=0, stop=None):
+        """
+        Reads a column as numbers, as they are drawn, so that rules comparing cells can run over whole columns
+        :param col: the column
+        :param start: the first row
+        :param stop: one past the last row. Defaults to the end of the table
+        :return: a list with the number of every row, rounded to two decimals for a DECIMAL column, or None where the
+        cell is missing or doesn't read as a number
+        """
+        stop = self._len if stop is None else min(stop, self._len)
+        kind = self.kinds[col]
+        column = self._columns[col]
+        if kind == LABEL:
+            return [_to_number(value) for value in column[start:stop]]
+
+        mask = self._masks[col]
+        numbers = []
+        for index in range(start, stop):
+            state = mask[index]
+            if state == _PRESENT:
+                # round gives the same float as parsing the two decimal display string
+                numbers.append(round(column[index], 2) if kind == DECIMAL else float(column[index]))
+            elif state == _OTHER:
+                numbers.append(_to_number(self._others[(col, index)]))
+            else:
+                numbers.append(None)
+        return numbers
+
+
+def _is_decimal(value):
+    """
+    Checks if a value goes in the array of a DECIMAL column. Integers are drawn through a float as well
+    :param value: the value
+    :return: True if the value is a number
+    """
+    return type(value) is float or isinstance(value, (int, float))
+
+
+def _is_count(value):
+    """
+    Checks if a value goes in the array of a COUNT column without changing how it is drawn
+    :param value: the value
+    :return: True if the value is an integer that fits the array
+    """
+    return type(value) is int and -_INT64 <= value < _INT64
+
+
+# The check of the values kept in the array of every numeric column kind
+_FITS = {DECIMAL: _is_decimal, COUNT: _is_count}
+
+
+def _to_number(value):
+    """
+    Reads a value as a number
+    :param value: the value
+    :return: the float, or None if the value doesn't read as a number
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,21 @@
+# External library imports
+from reportlab.platypus import Paragraph
+
+
+def display_rows(rows, wrapped_cols, style):
+    """
+    Builds the display layer of a page. The raw rows are left untouched: each row is copied once, and the wrapped
+    columns of the copy hold paragraphs instead of strings
+    :param rows: the raw rows of the page
+    :param wrapped_cols: the columns whose text is wrapped within the cell
+    :param style: the paragraph style of the wrapped text
+    :return: a new list of rows to be handed to the table
+    """
+    display = []
+    for row in rows:
+        row = list(row)
+        for col in wrapped_cols:
+            row[col] = Paragraph(row[col], style)
+        display.append(row)
+
+    return display
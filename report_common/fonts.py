@@ -0,0 +1,247 @@
+# Standard library imports
+import hashlib
+import io
+import marshal
+import os
+import tempfile
+import threading
+import time
+import types
+
+# External library imports
+import reportlab
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont, TTFontFace, TTFOpenFile, TTFNameBytes
+
+# Local imports
+from report_common.measure import clear_measure_cache
+
+# The faces used by every report, with the font files they are loaded from
+REPORT_FONTS = {
+    "SimHei": "simhei.ttf",
+    "SimHei-Bold": "simhei_bold.ttf",
+}
+
+# The folder of the pre-parsed font cache. Set REPORT_FONT_CACHE_DIR to an empty string to turn the cache off
+FONT_CACHE_DIR = os.environ.get("REPORT_FONT_CACHE_DIR",
+                                os.path.join(os.path.expanduser("~"), ".cache", "report_fonts"))
+
+# The font file and the first load time in seconds of every face registered so far, per face name
+_registered = {}
+_lock = threading.Lock()
+
+
+def register_font(name, path):
+    """
+    Registers a TrueType face with reportlab, parsing the font file only the first time the face is asked for. Asking
+    again for the same face and file does nothing, so it is safe to call on every report
+    :param name: the name the face is registered under
+    :param path: the font file. Relative paths are looked up like reportlab does, starting in the working directory
+    :return: the time in seconds it took to load the face the first time
+    """
+    with _lock:
+        entry = _registered.get(name)
+        if entry is not None and entry[0] == path:
+            return entry[1]
+
+        start = time.perf_counter()
+        pdfmetrics.registerFont(_CachedTTFont(name, load_face(path)))
+        load_time = time.perf_counter() - start
+
+        # A face registered again from another file has different glyph widths
+        if entry is not None:
+            clear_measure_cache()
+        _registered[name] = (path, load_time)
+
+        return load_time
+
+
+def register_report_fonts():
+    """
+    Registers all the faces used by the reports. Only the first call of the process parses the font files
+    :return:
+    """
+    for name, path in REPORT_FONTS.items():
+        register_font(name, path)
+
+
+def warm_up(fonts=None):
+    """
+    Loads the fonts ahead of the first report, e.g. when a worker process starts
+    :param fonts: a dict of face names and font files. Defaults to the faces used by the reports
+    :return: a dict with the first load time in seconds of every face
+    """
+    fonts = REPORT_FONTS if fonts is None else fonts
+    return {name: register_font(name, path) for name, path in fonts.items()}
+
+
+def font_load_times():
+    """
+    Reports how long the first load of every registered face took
+    :return: a dict with the first load time in seconds per face name
+    """
+    with _lock:
+        return {name: load_time for name, (path, load_time) in _registered.items()}
+
+
+def load_face(path, cache_dir=None):
+    """
+    Loads a parsed TrueType face, from the on-disk cache when possible. The cache entries are keyed by the hash of the
+    font file and the reportlab version, so a changed font file or a reportlab upgrade never reads a stale entry.
+    An entry only holds the parsed tables and metrics, as plain data that can't run code when it is read, and the font
+    bytes are always read from the font file. Unreadable or broken entries are ignored and rewritten, and a cache folder
+    that other users can write to is not used
+    :param path: the font file
+    :param cache_dir: the folder of the cache. Defaults to FONT_CACHE_DIR. The cache is off when it is empty
+    :return: the parsed face
+    """
+    cache_dir = FONT_CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir:
+        return TTFontFace(path)
+
+    # The font file is looked up like reportlab does, including its font search path
+    filename, f = TTFOpenFile(path)
+    with f:
+        font_data = f.read()
+    key = hashlib.sha256(font_data).hexdigest()
+    cache_file = os.path.join(cache_dir, f"{key}-rl{reportlab.Version}.marshal")
+
+    if _is_private(cache_dir):
+        try:
+            with open(cache_file, "rb") as f:
+                face = _face_from_state(marshal.load(f), font_data, filename)
+            if face is not None:
+                return face
+        except Exception:
+            pass
+
+    # The face is parsed from the bytes already read for the hash, rather than from the font file again
+    font_file = io.BytesIO(font_data)
+    font_file.name = filename
+    face = TTFontFace(font_file)
+    _write_cache(cache_dir, cache_file, face)
+
+    return face
+
+
+def _is_private(cache_dir):
+    """
+    Checks that the cache folder belongs to the current user and that no one else can write to it. On systems without
+    file owners, only the folder has to exist
+    :param cache_dir: the folder of the cache
+    :return: True if the entries of the folder can be trusted
+    """
+    try:
+        st = os.stat(cache_dir)
+    except OSError:
+        return False
+    if not hasattr(os, "getuid"):
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def _face_state(face):
+    """
+    Extracts the parsed tables and metrics of a face, as plain data that marshal can write. The font bytes are left
+    out, they are read from the font file
+    :param face: the parsed face
+    :return: a dict with the attributes of the face, and the attributes that are TrueType names
+    """
+    attributes = {name: value for name, value in vars(face).items() if name not in ("_ttf_data", "filename")}
+    names = [name for name, value in attributes.items() if isinstance(value, TTFNameBytes)]
+    return {"attributes": {name: bytes(value) if name in names else value for name, value in attributes.items()},
+            "names": names}
+
+
+def _face_from_state(state, font_data, filename):
+    """
+    Rebuilds a parsed face from the state of a cache entry
+    :param state: the state read from the entry, as written by _face_state
+    :param font_data: the bytes of the font file
+    :param filename: the font file
+    :return: the face, or None if the state isn't a valid entry
+    """
+    if not isinstance(state, dict) or set(state) != {"attributes", "names"} or not _is_plain(state):
+        return None
+    attributes, names = state["attributes"], state["names"]
+    if not isinstance(attributes, dict) or not isinstance(names, list):
+        return None
+
+    face = TTFontFace.__new__(TTFontFace)
+    for name, value in attributes.items():
+        setattr(face, name, TTFNameBytes(value) if name in names else value)
+    face._ttf_data = font_data
+    face.filename = filename
+    return face
+
+
+# The types of the values found in a parsed face
+_PLAIN_TYPES = (type(None), bool, int, float, str, bytes)
+
+
+def _is_plain(value):
+    """
+    Checks that a value read from a cache entry only holds plain data
+    :param value: the value
+    :return: True if the value and everything it holds are numbers, strings, bytes, tuples, lists or dicts
+    """
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if type(value) in _PLAIN_TYPES:
+            continue
+        if type(value) in (tuple, list):
+            stack.extend(value)
+        elif type(value) is dict:
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        else:
+            return False
+    return True
+
+
+def _write_cache(cache_dir, cache_file, face):
+    """
+    Stores the parsed tables and metrics of a face in the cache. The entry is written to a temporary file first and
+    renamed into place, so a reader never sees half an entry. A cache that can't be written, or that other users can
+    write to, is skipped
+    :param cache_dir: the folder of the cache
+    :param cache_file: the cache entry of the face
+    :param face: the parsed face
+    :return:
+    """
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        if not _is_private(cache_dir):
+            return
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump(_face_state(face), f)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+    except Exception:
+        pass
+
+
+# TTFont.__init__, run with a face factory that hands over the face it is given instead of parsing a font file, so
+# everything else a font holds is still set up by reportlab itself
+_init_around_face = types.FunctionType(TTFont.__init__.__code__,
+                                       dict(TTFont.__init__.__globals__, TTFontFace=lambda face, **kwargs: face),
+                                       TTFont.__init__.__name__, TTFont.__init__.__defaults__,
+                                       TTFont.__init__.__closure__)
+
+
+class _CachedTTFont(TTFont):
+    """
+    A TrueType font built around a face that is already parsed. Everything else is set up by TTFont.__init__
+    """
+
+    def __init__(self, name, face):
+        """
+        :param name: the name the font is registered under
+        :param face: the parsed face
+        """
+        _init_around_face(self, name, face)
@@ -0,0 +1,31 @@
+def two_decimals(value):
+    """
+    Formats a number with two decimals. Anything else, e.g. the empty string of a missing value, is left as it is
+    :param value: the value of a cell
+    :return: the display value
+    """
+    if isinstance(value, (int, float)):
+        return f"{value:.2f}"
+    return value
+
+
+def compile_formatters(width, decimal_cols):
+    """
+    Compiles the column schema of a table once, so rows are formatted without looking every column up in the schema
+    :param width: the number of columns of the rows
+    :param decimal_cols: the columns whose numbers are drawn with two decimals
+    :return: a tuple of (column, formatter) pairs, one for every column that needs formatting
+    """
+    return tuple((col, two_decimals) for col in sorted(set(decimal_cols)) if col < width)
+
+
+def format_row(row, formatters):
+    """
+    Formats a row in place
+    :param row: the row, as a list of raw values
+    :param formatters: the compiled formatters of the table
+    :return: the row
+    """
+    for col, formatter in formatters:
+        row[col] = formatter(row[col])
+    return row
@@ -0,0 +1,241 @@
+# Standard library imports
+import codecs
+import io
+import json
+import os
+import re
+
+# The size of the chunks read from the source
+_CHUNK_SIZE = 1 << 16
+
+# What may be left of a number cut at the end of a chunk, e.g. "." and "5" of 12.5
+_NUMBER_TAIL = re.compile(r"[0-9+\-.eE]*\Z")
+
+# The header fields read by the reports
+_HEADER = {field: None for field in ["reportCode", "startDateStr", "endDateStr", "kitsName", "laboratoryName",
+                                     "laboratoryRelation", "batchCode", "qualityControls", "batchExpirationDateStr",
+                                     "summary"]}
+
+# The statistics of a level in the project and batch reports
+_LEVEL_STATS = {field: None for field in ["level", "testMean", "testSd", "testCv", "monthMean", "monthSd", "monthCv",
+                                          "monthDataCount", "monthUncontrolledDataCount", "monthControlRate",
+                                          "controlMean", "controlSd", "controlCv", "totalMean", "totalSd", "totalCv",
+                                          "totalDataCount", "totalUncontrolledRate", "goalCv", "goalSd"]}
+
+_PROJECT_LIST = {"analytesName": None, "measureUnit": None, "levelDataList": _LEVEL_STATS}
+_BATCH_LIST = {"batchCode": None, "testProjectList": {"analytesName": None, "levelDataList": _LEVEL_STATS}}
+
+# The fields read by every report type: the list holding the rows of the report, and the fields kept at the top level
+# and in every item of the list. None keeps a value as it is, a dict keeps only its fields, in a dict or in every dict
+# of a list
+PROJECTIONS = {
+    "cv": ("cvDataList", {
+        **_HEADER,
+        "cvDataList": {"analytesName": None, "target": None,
+                       "levelData": {"level": None, "dataList": {"yearMonth": None, "cv": None}}}}),
+    "cv_two_month": ("projectMonthDataList", {
+        **_HEADER,
+        "levelList": None,
+        "projectMonthDataList": {"analytesName": None,
+                                 "monthDataList": {"level": None, "target": None,
+                                                   "monthData": {"yearMonth": None, "mean": None, "cv": None,
+                                                                 "dataCount": None}}}}),
+    "out_of_control": ("projectDataList", {
+        **_HEADER,
+        "projectDataList": {"analytesName": None,
+                            "pointDataList": {"level": None, "createTime": None, "pointValue": None, "mean": None,
+                                              "sd": None, "zPoint": None, "acceptable": None,
+                                              "operationUserName": None, "spcRule": None, "remark": None,
+                                              "actionLogList": {"actionDesc": None, "operationUserName": None,
+                                                                "createTime": None}}}}),
+    "month_project": ("testProjectList", {**_HEADER, "testProjectList": _PROJECT_LIST}),
+    "year_project": ("testProjectList", {**_HEADER, "testProjectList": _PROJECT_LIST}),
+    "month_batch": ("batchManageList", {**_HEADER, "batchManageList": _BATCH_LIST}),
+    "year_batch": ("batchManageList", {**_HEADER, "batchManageList": _BATCH_LIST}),
+}
+
+
+def project(value, projection):
+    """
+    Keeps only the fields of a value read by a report
+    :param value: a parsed json value
+    :param projection: the fields to keep, as in PROJECTIONS
+    :return: the projected value
+    """
+    if projection is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, projection) for item in value]
+    if isinstance(value, dict):
+        return {field: project(value[field], inner) for field, inner in projection.items() if field in value}
+    return value
+
+
+def load_payload(source, report_type):
+    """
+    Parses a payload incrementally, keeping only the fields read by the report. The items of the list holding the rows
+    of the report are parsed and projected one at a time, so the raw payload is never in memory as a whole, only the
+    projected one is. Memory is bounded by the projected payload, plus a chunk and a few times the raw text of the
+    largest item of the list, not by a page: every report counts its rows for the header before drawing its table, and
+    the statistics and two-month reports build their tables as a whole, so the list is handed over whole
+    :param source: the payload, as bytes, a path or a binary file-like object
+    :param report_type: one of PROJECTIONS
+    :return: the projected payload
+    """
+    if report_type not in PROJECTIONS:
+        raise ValueError(f"Unknown report type {report_type!r}, expected one of {', '.join(PROJECTIONS)}")
+    list_field, projection = PROJECTIONS[report_type]
+
+    stream = _JsonStream(source)
+    payload = {}
+    try:
+        stream.expect("{")
+        for field in stream.object_fields():
+            if field == list_field and stream.peek() == "[":
+                payload[field] = [project(item, projection[field]) for item in stream.array_items()]
+                continue
+            value = stream.value()
+            if field in projection:
+                payload[field] = project(value, projection[field])
+    finally:
+        stream.close()
+
+    return payload
+
+
+class _JsonStream:
+    """
+    Reads a json document a value at a time. The source is decoded in chunks, and every value is parsed with the json
+    decoder as soon as it is complete, so the buffer only holds the value being parsed
+    """
+
+    def __init__(self, source):
+        """
+        :param source: the document, as bytes, a path or a binary file-like object
+        """
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._file, self._owned = io.BytesIO(source), True
+        elif isinstance(source, (str, os.PathLike)):
+            self._file, self._owned = open(source, "rb"), True
+        else:
+            self._file, self._owned = source, False
+
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def close(self):
+        """
+        Closes the source if it was opened here
+        :return:
+        """
+        if self._owned:
+            self._file.close()
+
+    def peek(self):
+        """
+        Skips the whitespace up to the next character
+        :return: the next character, or an empty string at the end of the document
+        """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\n\r":
+                self._pos += 1
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos:self._pos + 1]
+
+    def expect(self, char):
+        """
+        Reads a structural character
+        :param char: the expected character
+        :return:
+        """
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self._buffer, self._pos)
+        self._pos += 1
+
+    def value(self):
+        """
+        Parses the next value
+        :return: the parsed value
+        """
+        self.peek()
+        read_size = _CHUNK_SIZE
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill(read_size):
+                    raise
+                read_size *= 2
+                continue
+
+            # A number at the end of the buffer may go on in the next chunk
+            if _NUMBER_TAIL.match(self._buffer, end) and self._fill(read_size):
+                continue
+
+            self._pos = end
+            self._compact()
+            return value
+
+    def object_fields(self):
+        """
+        Iterates over the fields of the object being read, right after its opening brace. The value of every field
+        has to be read before the next one is asked for
+        :return: a generator of the field names
+        """
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            field = self.value()
+            self.expect(":")
+            yield field
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def array_items(self):
+        """
+        Parses the items of the array starting at the current position one at a time
+        :return: a generator of the parsed items
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self._pos += 1
+                continue
+            self.expect("]")
+            return
+
+    def _fill(self, size=_CHUNK_SIZE):
+        """
+        Reads the next chunk of the source into the buffer
+        :param size: the number of bytes to read
+        :return: False at the end of the source
+        """
+        if self._eof:
+            return False
+        chunk = self._file.read(size)
+        if not chunk:
+            self._eof = True
+            self._buffer += self._text.decode(b"", final=True)
+            return False
+        self._buffer += self._text.decode(chunk)
+        return True
+
+    def _compact(self):
+        """
+        Drops the part of the buffer that has been read
+        :return:
+        """
+        if self._pos > _CHUNK_SIZE:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
@@ -0,0 +1,452 @@
+# Standard library imports
+from collections import namedtuple
+from itertools import accumulate, chain
+
+# External library imports
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.platypus import Table, TableStyle, Paragraph
+
+# Local imports
+from report_common.display import display_rows
+from report_common.measure import wrapped_height
+from report_common.pagination import RowIndex, fit_page
+from report_common.timing import NULL_TIMER
+
+# The rows of a page, as handed to the page styler of a table
+Page = namedtuple("Page", ["rows", "start", "stop", "row_index", "style"])
+
+# Where the table is placed on the last page: the vertical position below which the summary box goes, and the height
+# of the table on that page
+Placement = namedtuple("Placement", ["val", "last_height"])
+
+# The two looks of the summary box. The CV report outlines the inner text box, the stats reports the outer one
+_SUMMARY_BOXES = {
+    "inner": dict(indent=30, fit_margin=8, text_shift=-6 - 3, inner_y=-8, inner_radius=2, outer_stroke=0,
+                  inner_stroke=1, title_size=10, title_shift=-8 - 10),
+    "outer": dict(indent=23, fit_margin=0, text_shift=-2, inner_y=0, inner_radius=1, outer_stroke=1,
+                  inner_stroke=0, title_size=9, title_shift=-11),
+}
+
+
+class TableSpec:
+    """
+    Declarative description of the data table of a report. The layout engine measures, paginates, builds and styles
+    the table from it, so the report types only describe their columns.
+    """
+
+    def __init__(self, col_widths, style, paragraph_style, measured_cols, wrapped_cols, grouped=False, padding=2,
+                 first_page_rows=20, one_page_lines=15, last_page_lines=25, page_rows=30, cell_y=19,
+                 page_styler=None):
+        """
+        :param col_widths: the column widths handed to the table. Either a list or a single width for all columns
+        :param style: the base TableStyle of every page
+        :param paragraph_style: the paragraph style of the wrapped columns
+        :param measured_cols: a list of (column, width) pairs measured for the row heights. The first one is the label
+        column
+        :param wrapped_cols: the columns drawn as wrapped paragraphs
+        :param grouped: if True, the rows following a label with an empty label belong to its group, and the label is
+        spanned over the group
+        :param padding: the horizontal padding taken off the width of a measured column
+        :param first_page_rows: the number of cell_y units available on the first page, below an unwrapped header
+        :param one_page_lines: the number of cell_y units up to which the table and the summary share the first page
+        :param last_page_lines: the number of cell_y units up to which the rest of the table goes on the last page
+        :param page_rows: the number of cell_y units available on a full page
+        :param cell_y: the height of a single line row
+        :param page_styler: a callable taking the table and the Page, applying the rules of the report. Optional
+        """
+        self.col_widths = col_widths
+        self.style = style
+        self.paragraph_style = paragraph_style
+        self.measured_cols = measured_cols
+        self.wrapped_cols = wrapped_cols
+        self.grouped = grouped
+        self.padding = padding
+        self.first_page_rows = first_page_rows
+        self.one_page_lines = one_page_lines
+        self.last_page_lines = last_page_lines
+        self.page_rows = page_rows
+        self.cell_y = cell_y
+        self.page_styler = page_styler
+
+    def measure_row(self, row):
+        """
+        Measures a single row, as it is pulled from the rows of the report
+        :param row: a row of the table
+        :return: the height of the label cell, and the height of the tallest of the other measured cells (None when
+        only the label column is measured)
+        """
+        heights = [self._cell_height(row[col], width) for col, width in self.measured_cols]
+        return heights[0], max(heights[1:]) if len(heights) > 1 else None
+
+    def _cell_height(self, text, width):
+        """
+        Calculates the cell height required to fit a text
+        :param text: the text of the cell
+        :param width: the width of the column
+        :return: the cell height
+        """
+        width = width - self.padding
+        line_height = wrapped_height("S", width, self.paragraph_style)
+        lines_needed = wrapped_height(text, width, self.paragraph_style) // line_height
+        if lines_needed <= 1:
+            return self.cell_y
+        return lines_needed * self.paragraph_style.leading
+
+
+class _RowStream:
+    """
+    The rows of a table that have not been drawn yet. Rows are pulled from the rows of the report only when a page
+    needs them, and measured once as they arrive, so the first pages are laid out while the rest of the rows are still
+    to be extracted. Only the rows of the page being laid out, and at most a page of rows after it, are held
+    """
+
+    def __init__(self, spec, rows, timer):
+        """
+        :param spec: the TableSpec of the table
+        :param rows: an iterable of the rows of the table
+        :param timer: the StageTimer of the report. Pulling a row is charged to extraction, measuring it to
+        measurement
+        """
+        self.spec = spec
+        self.start = 0
+        self.rows = []
+        self.label_heights = []
+        self.cell_heights = []
+        self.heights = []
+        self.height = 0
+        self._rows = iter(rows)
+        self._timer = timer
+        self._exhausted = False
+
+    def has_rows(self):
+        """
+        Checks if rows are left to be drawn
+        :return: True if at least one row is left
+        """
+        return bool(self.rows) or self._pull()
+
+    def fits(self, lines):
+        """
+        Checks if the rows left to be drawn fit in a number of lines, pulling no more rows than needed to tell
+        :param lines: the number of cell_y units
+        :return: True if all the rows left fit
+        """
+        while self.height / self.spec.cell_y <= lines:
+            if not self._pull():
+                return True
+        return False
+
+    def take(self, lines):
+        """
+        Takes the rows of a page, as many as fit in a number of lines. Rows are pulled until they overflow the page,
+        and the page break is found with fit_page on their heights. A row taller than the page gets a page of its own
+        :param lines: the number of cell_y units available on the page
+        :return: the Page of the rows
+        """
+        budget = lines * self.spec.cell_y
+        while self.height <= budget and self._pull():
+            pass
+        return self._page(fit_page(list(accumulate(self.heights, initial=0)), 0, budget) if self.rows else 0)
+
+    def take_all(self):
+        """
+        Takes all the rows left
+        :return: the Page of the rows
+        """
+        while self._pull():
+            pass
+        return self._page(len(self.rows))
+
+    def _pull(self):
+        """
+        Pulls and measures the next row
+        :return: False once all the rows have been pulled
+        """
+        if self._exhausted:
+            return False
+        try:
+            row = next(self._rows)
+        except StopIteration:
+            self._exhausted = True
+            return False
+        finally:
+            self._timer.lap("extraction")
+
+        label_height, cell_height = self.spec.measure_row(row)
+        self.rows.append(row)
+        self.label_heights.append(label_height)
+        self.cell_heights.append(cell_height)
+        self.heights.append(label_height if cell_height is None else max(label_height, cell_height))
+        self.height += self.heights[-1]
+        self._timer.lap("measurement")
+        return True
+
+    def _page(self, count):
+        """
+        Takes the next rows off the stream
+        :param count: the number of rows
+        :return: the Page of the rows, indexed by their position in the whole table
+        """
+        spec = self.spec
+        rows = self.rows[:count]
+        cell_heights = self.cell_heights[:count] if len(spec.measured_cols) > 1 else None
+        labels = [row[spec.measured_cols[0][0]] for row in rows] if spec.grouped else None
+        row_index = RowIndex(self.label_heights[:count], cell_heights, labels=labels, cell_y=spec.cell_y,
+                             offset=self.start)
+        page = Page(rows, self.start, self.start + count, row_index, spec.style)
+
+        del self.rows[:count], self.label_heights[:count], self.cell_heights[:count], self.heights[:count]
+        self.height -= row_index.total_height
+        self.start += count
+        return page
+
+
+def paginate(spec, rows, header_rows=0, timer=NULL_TIMER):
+    """
+    Splits the rows of a table into the pages draw_table lays them out on: the first page below the header, full pages
+    as long as what is left doesn't fit on the last page, then the last page. The rows are pulled and measured only as
+    far as the page being laid out needs
+    :param spec: the TableSpec of the table
+    :param rows: an iterable of the rows of the table
+    :param header_rows: the number of rows the header box takes from the first page because of wrapped text
+    :param timer: the StageTimer of the report. Optional
+    :return: whether the table shares the first page with the summary box, and a generator of ("first", "full" or
+    "last", Page) for every page
+    """
+    stream = _RowStream(spec, rows, timer)
+
+    # A short table shares the first page with the summary box
+    one_page = stream.fits(spec.one_page_lines - header_rows)
+
+    return one_page, _pages(spec, stream, header_rows)
+
+
+def _pages(spec, stream, header_rows):
+    """
+    Takes the pages of a table off its stream of rows, one page at a time
+    :param spec: the TableSpec of the table
+    :param stream: the _RowStream of the rows
+    :param header_rows: the number of rows the header box takes from the first page
+    :return: a generator of ("first", "full" or "last", Page)
+    """
+    yield "first", stream.take(spec.first_page_rows - header_rows)
+
+    while stream.has_rows() and not stream.fits(spec.last_page_lines):
+        yield "full", stream.take(spec.page_rows)
+
+    if stream.has_rows():
+        yield "last", stream.take_all()
+
+
+def draw_table(pdf, spec, rows, frame, table_top, header_rows=0, timer=NULL_TIMER):
+    """
+    Draws the data table of a report over as many pages as it needs. The first page continues below the header, the
+    full pages in between are filled from top to bottom, and the last page is left with room for the summary box.
+    The rows are pulled one at a time, so a generator of rows is laid out and drawn page by page as it is consumed
+    :param pdf: the canvas, on the first page
+    :param spec: the TableSpec of the table
+    :param rows: an iterable of the rows of the table
+    :param frame: the (left, bottom, right, top) margins of the page
+    :param table_top: the vertical position where the table starts on the first page
+    :param header_rows: the number of rows the header box takes from the first page because of wrapped text
+    :param timer: the StageTimer of the report. Optional
+    :return: the Placement of the table on the last page
+    """
+    left, bottom, right, top = frame
+    one_page, pages = paginate(spec, rows, header_rows, timer)
+
+    # First page, right below the header
+    _, page = next(pages)
+    table = _page_table(spec, page, [0, 0, 0, 0] if one_page else [0, 0, 1, 1], timer, first_page=True)
+    table_height = table.wrapOn(pdf, right - left, top - bottom)[1]
+    _draw_at(pdf, table, left, 28, table_top - 15 - bottom - table_height - 2)
+    timer.lap("drawing")
+
+    # The first page is done, unless the whole table shares it with the summary box
+    following = next(pages, None)
+    if following is not None or not one_page:
+        pdf.showPage()
+
+    for kind, page in chain([following] if following is not None else [], pages):
+        # Full pages, as long as what is left doesn't fit on the last page
+        if kind == "full":
+            table = _page_table(spec, page, [1, 1, 1, 1], timer)
+            height = table.wrapOn(pdf, right - left, top - bottom)[1]
+            _draw_at(pdf, table, left, bottom + 3, top - bottom - height)
+            pdf.showPage()
+            timer.lap("drawing")
+            continue
+
+        # Last page. The rest of the table goes to the top of the page
+        table = _page_table(spec, page, [1, 1, 0, 0], timer)
+        height = table.wrapOn(pdf, right - left, top - bottom)[1]
+        val = top - bottom - height - 2
+        _draw_at(pdf, table, left, bottom + 3, val)
+        timer.lap("drawing")
+        return Placement(val, height)
+
+    # The whole table is on the first page, together with the header
+    if one_page and following is None:
+        return Placement(table_top - bottom - table_height - 3, top - table_top + table_height - 12)
+
+    # Nothing is left, the summary box starts a page of its own
+    return Placement(top - 12, 0)
+
+
+def handle_groups(table, page):
+    """
+    Spans the first column over every group of rows of a page. The group boundaries come from the row index of the
+    page, and all the spans are applied with a single setStyle call
+    :param table: the table of the page
+    :param page: the Page of the rows. Its row index covers the rows of the page, indexed by their position in the
+    whole table
+    :return:
+    """
+    rowspan = page.row_index.group_spans(page.start, page.stop)
+    if not rowspan:
+        return
+
+    table_style = [('GRID', (0, 0), (0, -1), 1, colors.gray)]
+    current_row = 0
+    for group_rowspan in rowspan:
+        table_style.append(('SPAN', (0, current_row), (0, current_row + group_rowspan - 1)))
+        current_row += group_rowspan
+    table.setStyle(TableStyle(table_style))
+
+
+def _page_table(spec, page, corner_radii, timer, first_page=False):
+    """
+    Builds and styles the table of a page
+    :param spec: the TableSpec of the table
+    :param page: the Page of the rows
+    :param corner_radii: the corner radii of the table
+    :param timer: the StageTimer of the report
+    :param first_page: True for the first page, whose top border is drawn by the header
+    :return: the table of the page
+    """
+    table = Table(display_rows(page.rows, spec.wrapped_cols, spec.paragraph_style), colWidths=spec.col_widths,
+                  rowHeights=page.row_index.row_heights(page.start, page.stop), cornerRadii=corner_radii)
+    if first_page:
+        table.setStyle(TableStyle([('LINEABOVE', (0, 0), (-1, 0), 0, colors.white)]))
+    table.setStyle(spec.style)
+    timer.lap("table")
+
+    # Apply the rules of the report
+    if spec.page_styler is not None:
+        spec.page_styler(table, page)
+        timer.lap("styling")
+
+    return table
+
+
+def _draw_at(pdf, table, x, y, offset):
+    """
+    Draws a table that has already been wrapped
+    :param pdf: the canvas
+    :param table: the table
+    :param x: the horizontal origin
+    :param y: the vertical origin
+    :param offset: the vertical position of the table relative to the origin
+    :return:
+    """
+    pdf.saveState()
+    pdf.translate(x, y)
+    table.drawOn(pdf, 0, offset)
+    pdf.restoreState()
+
+
+def draw_summary_box(pdf, summary_text, placement, frame, paragraph_style, title, outline="inner", cell_y=19):
+    """
+    Draws the summary box below the table, or at the top of a new page if it doesn't fit. The box has a minimum size
+    and grows with the summary text
+    :param pdf: the canvas, on the last page of the table
+    :param summary_text: the summary. Every line is drawn as a paragraph
+    :param placement: the Placement of the table on the last page
+    :param frame: the (left, bottom, right, top) margins of the page
+    :param paragraph_style: the paragraph style of the summary text
+    :param title: the title drawn at the top left of the box
+    :param outline: "inner" to outline the text box, "outer" to outline the whole box
+    :param cell_y: the height of a single line row
+    :return:
+    """
+    left, bottom, right, top = frame
+    box = _SUMMARY_BOXES[outline]
+    val, last_height = placement
+
+    # Outer visible box
+    x = left
+    y = val - 11 - 3 * cell_y
+    width = right - left
+    min_height = 25 + 3 * cell_y
+
+    # Inner transparent textbox
+    x_inner = x + box["indent"]
+    width_inner = width - box["indent"]
+
+    # Split the string into lines
+    lines = summary_text.split('\n')
+
+    # Check if the box fits in the current page
+    fit_height = 0
+    for line in lines:
+        fit_height += wrapped_height(line, right, paragraph_style)
+
+    # If it doesn't fit, transfer it to the next page
+    if fit_height + box["fit_margin"] > top - last_height - bottom - 35 + 2:
+        pdf.showPage()
+        val = top - 12
+        y = val - 11 - 3 * cell_y
+
+    # Iterate through each line and draw it within the box. If the box doesn't fit the line, it automatically
+    # creates a new line. The box size is set to a minimum value. It, however, resizes dynamically if the summary
+    # requires a bigger space
+    paragraph_height = 0
+    for line in lines:
+        line_paragraph = Paragraph(line, paragraph_style)
+        line_height = line_paragraph.wrap(right - 40, left + 120)[1]
+        paragraph_height += line_height
+
+        # Place the paragraph inside the rectangle
+        paragraph_width = width_inner - (2 * mm)  # Subtract padding
+        line_paragraph.wrapOn(pdf, paragraph_width, line_height)
+        y_parag = y + (min_height - paragraph_height)
+        line_paragraph.drawOn(pdf, x_inner + mm, y_parag + box["text_shift"])
+
+    # Draw the inner and outer box
+    if paragraph_height >= min_height:
+        y -= (paragraph_height - min_height)
+    pdf.setStrokeColor(colors.black)
+    pdf.setFillColor(colors.white)
+    paragraph_height = min_height if min_height >= paragraph_height else paragraph_height
+    pdf.roundRect(x, y - 2, width, paragraph_height + 2, [0, 0, 1, 1], fill=0, stroke=box["outer_stroke"])
+    pdf.roundRect(x_inner, y + box["inner_y"], width_inner, paragraph_height, box["inner_radius"], fill=0,
+                  stroke=box["inner_stroke"])
+
+    # Print the summary title
+    pdf.setFillColor(colors.black)
+    pdf.setFont("SimHei", box["title_size"])
+    pdf.drawString(x + 2, y + paragraph_height + box["title_shift"], title)
+
+
+def draw_signature(pdf, frame):
+    """
+    Draws the reviewer and date fields, docked to the bottom margin of the current page
+    :param pdf: the canvas
+    :param frame: the (left, bottom, right, top) margins of the page
+    :return:
+    """
+    left, bottom, right, top = frame
+    from_bottom = bottom + 10
+
+    # Reviewer
+    pdf.setFillColor(colors.black)
+    pdf.setFont("SimHei", 12)
+    pdf.drawString(right - 300, from_bottom, "审核人: ")
+    pdf.setStrokeColor(colors.black)
+    pdf.line(right - 255, from_bottom, right - 148, from_bottom)
+
+    # Time and date
+    pdf.setFont("SimHei", 12)
+    pdf.drawString(right - 140, from_bottom, "时间: ")
+    pdf.line(right - 107, from_bottom, right, from_bottom)
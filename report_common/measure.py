@@ -0,0 +1,111 @@
+# Standard library imports
+from functools import lru_cache
+
+# External library imports
+from reportlab.lib.textsplit import dumbSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Paragraph
+from reportlab.platypus.paragraph import cleanBlockQuotedText
+from reportlab.rl_config import _FUZZ
+
+# The number of distinct (text, width, style) measurements kept in memory
+MEASURE_CACHE_SIZE = 16384
+
+# The width of every glyph measured so far, per (font name, font size)
+_glyph_widths = {}
+
+
+@lru_cache(maxsize=MEASURE_CACHE_SIZE)
+def wrapped_height(text, width, style):
+    """
+    Measures the height a text needs once it is wrapped as a paragraph. The results are cached process-wide, so the
+    analyte names, levels and rules that repeat across rows and reports are only wrapped once.
+    :param text: the text to be written in the cell
+    :param width: the available width
+    :param style: the paragraph style. Styles are compared by identity
+    :return: the height of the wrapped paragraph
+    """
+    # Plain text is measured from the font metrics. Markup still needs the full paragraph parser
+    if width >= _FUZZ and _is_plain(text, style):
+        return _plain_line_count(text, width, style) * style.leading
+
+    return Paragraph(text, style).wrap(width, 0)[1]
+
+
+def _is_plain(text, style):
+    """
+    Checks if a paragraph is a single run of CJK wrapped text in the style's font, which is the case that can be
+    measured without building the paragraph
+    :param text: the text to be written in the cell
+    :param style: the paragraph style
+    :return: True if the text can be measured from the font metrics
+    """
+    return (isinstance(text, str) and "<" not in text and "&" not in text
+            and style.wordWrap == "CJK"
+            and not getattr(style, "bulletText", None)
+            and not style.endDots
+            and not style.textTransform
+            and getattr(style, "autoLeading", "") in ("", "off"))
+
+
+def char_widths(text, font_name, font_size):
+    """
+    Looks up the width of every character of the text, measuring each glyph only once per font
+    :param text: the text to be measured
+    :param font_name: the name of a registered font
+    :param font_size: the font size
+    :return: a list with the width of each character
+    """
+    glyph_widths = _glyph_widths.setdefault((font_name, font_size), {})
+    widths = []
+    for char in text:
+        width = glyph_widths.get(char)
+        if width is None:
+            width = glyph_widths[char] = stringWidth(char, font_name, font_size)
+        widths.append(width)
+
+    return widths
+
+
+def _plain_line_count(text, width, style):
+    """
+    Counts the lines a plain text paragraph is wrapped into. This is the same arithmetic Paragraph.wrap does on the
+    cumulative glyph widths of a single CJK fragment, without running the markup parser.
+    :param text: the text to be written in the cell
+    :param width: the available width
+    :param style: the paragraph style
+    :return: the number of lines
+    """
+    text = cleanBlockQuotedText(text)
+    if not text:
+        return 0
+
+    first_width = width - style.leftIndent - style.firstLineIndent - style.rightIndent
+    later_width = width - style.leftIndent - style.rightIndent
+    widths = char_widths(text, style.fontName, style.fontSize)
+
+    # Most cells fit in a single line, which doesn't need the line breaking rules
+    width_used = 0
+    for char_width in widths:
+        width_used += char_width
+    if width_used <= first_width + _FUZZ:
+        return 1 if width_used > 0 else 0
+
+    return len(dumbSplit(text, widths, [first_width, later_width]))
+
+
+def measure_cache_info():
+    """
+    Reports the state of the measurement cache
+    :return: a named tuple with the hits, misses, maxsize and currsize of the cache
+    """
+    return wrapped_height.cache_info()
+
+
+def clear_measure_cache():
+    """
+    Empties the measurement cache and resets its counters. Needed if a font is registered again under the same name
+    :return:
+    """
+    wrapped_height.cache_clear()
+    _glyph_widths.clear()
@@ -0,0 +1,36 @@
+# Standard library imports
+import io
+import os
+
+
+def output_target(output, default_name):
+    """
+    Resolves the output argument of a pdf_gen call into what the canvas writes to
+    :param output: a path, a binary file-like object, the bytes type to get the pdf back as bytes, or None to write
+    to default_name
+    :param default_name: the file written when no output is given
+    :return: a file name or a binary file-like object
+    """
+    if output is None:
+        return default_name
+    if output is bytes:
+        return io.BytesIO()
+    if hasattr(output, "write"):
+        return output
+
+    return os.fspath(output)
+
+
+def output_result(target, output):
+    """
+    Builds the return value of a pdf_gen call once the canvas is saved
+    :param target: what the canvas wrote to, as returned by output_target
+    :param output: the output argument of the pdf_gen call
+    :return: the pdf bytes if they were asked for, the file name if a file was written, otherwise None
+    """
+    if output is bytes:
+        return target.getvalue()
+    if isinstance(target, str):
+        return target
+
+    return None
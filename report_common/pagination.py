@@ -0,0 +1,128 @@
+# Standard library imports
+from bisect import bisect_right
+from itertools import accumulate
+
+
+def fit_pages(heights, page_budget, first_page_budget=None):
+    """
+    Splits rows into pages using the prefix sums of their heights. Each break is found with a binary search, so the
+    whole table is split in O(pages * log(rows)).
+    :param heights: the height of every row
+    :param page_budget: the height available for the rows of a full page
+    :param first_page_budget: the height available for the rows of the first page. Defaults to page_budget
+    :return: the index one past the last row of every page
+    """
+    if first_page_budget is None:
+        first_page_budget = page_budget
+    return _fit_prefix(list(accumulate(heights, initial=0)), page_budget, first_page_budget)
+
+
+def _fit_prefix(prefix, page_budget, first_page_budget):
+    """
+    Splits rows into pages given the prefix sums of their heights
+    :param prefix: the prefix sums of the row heights, starting with 0
+    :param page_budget: the height available for the rows of a full page
+    :param first_page_budget: the height available for the rows of the first page
+    :return: the index one past the last row of every page
+    """
+    n_rows = len(prefix) - 1
+    breaks = []
+    start = 0
+    budget = first_page_budget
+    while start < n_rows:
+        start = fit_page(prefix, start, budget)
+        breaks.append(start)
+        budget = page_budget
+
+    return breaks
+
+
+def fit_page(prefix, start, budget):
+    """
+    Finds the rows of the page starting at a row with a binary search on the prefix sums of the row heights
+    :param prefix: the prefix sums of the row heights, starting with 0
+    :param start: the first row of the page. At least one row has to be left from there
+    :param budget: the height available for the rows of the page
+    :return: the index one past the last row of the page
+    """
+    # The last row whose bottom is still within the budget. A row taller than the page gets a page of its own
+    stop = bisect_right(prefix, prefix[start] + budget, lo=start) - 1
+    return max(stop, start + 1)
+
+
+class RowIndex:
+    """
+    Pagination index of the rows of a page. It stores the height of every row, the prefix sums of those heights and the
+    group boundaries, so that the groups and the row heights of the page are found without re-measuring its rows.
+    """
+
+    def __init__(self, label_heights, cell_heights=None, labels=None, cell_y=19, offset=0):
+        """
+        :param label_heights: the height needed by the first (label) column of every row
+        :param cell_heights: the height needed by the remaining wrapped columns of every row. Optional
+        :param labels: the first column values. A non-empty value starts a new group. Grouping is off when None
+        :param cell_y: the height of a single line row
+        :param offset: the index of the first row in the whole table, when the index only covers some of its rows.
+        Rows are always given by their index in the whole table
+        """
+        self.cell_y = cell_y
+        self.offset = offset
+        self.label_heights = list(label_heights)
+        self.cell_heights = list(cell_heights) if cell_heights is not None else None
+
+        # The space a row takes on the page is the biggest cell in the row
+        if self.cell_heights is None:
+            self.heights = self.label_heights
+        else:
+            self.heights = [max(x, y) for x, y in zip(self.label_heights, self.cell_heights)]
+        self.prefix = list(accumulate(self.heights, initial=0))
+
+        # Every row with a non-empty label starts a new group
+        self.grouped = labels is not None
+        self.group_starts = [i + offset for i, label in enumerate(labels) if label] if self.grouped else []
+
+    def __len__(self):
+        return len(self.heights)
+
+    @property
+    def total_height(self):
+        return self.prefix[-1]
+
+    def group_spans(self, start, stop):
+        """
+        Computes the size of each group within the rows [start, stop). The first row always starts a group, since a
+        group that continues from the previous page is drawn as a group of its own.
+        :param start: the first row of the page
+        :param stop: one past the last row of the page
+        :return: a list with the number of rows in each group
+        """
+        if stop <= start:
+            return []
+        if not self.grouped:
+            return [stop - start]
+
+        lo = bisect_right(self.group_starts, start)
+        hi = bisect_right(self.group_starts, stop - 1)
+        bounds = [start] + self.group_starts[lo:hi] + [stop]
+        return [end - begin for begin, end in zip(bounds, bounds[1:])]
+
+    def row_heights(self, start, stop):
+        """
+        Computes the row heights of the rows [start, stop). The label of a group is shared between all the rows of
+        the group, so its height is spread equally over them.
+        :param start: the first row of the page
+        :param stop: one past the last row of the page
+        :return: a list of row heights
+        """
+        if not self.grouped:
+            return self.heights[start - self.offset:stop - self.offset]
+
+        label_heights = []
+        current_row = start
+        for span in self.group_spans(start, stop):
+            label_heights.extend([self.label_heights[current_row - self.offset] / span] * span)
+            current_row += span
+
+        if self.cell_heights is None:
+            return label_heights
+        return [max(x, y) for x, y in zip(label_heights, self.cell_heights[start - self.offset:stop - self.offset])]
@@ -0,0 +1,78 @@
+# Standard library imports
+import importlib
+import os
+import re
+import sys
+import threading
+
+# Local imports
+from report_common.fonts import warm_up
+
+# The report types, with the folder and module of their pdf_gen and the extra arguments it takes after the payload
+REPORT_TYPES = {
+    "cv": ("cv_report", "main_cv", ()),
+    "cv_two_month": ("cv_two_month", "cvTwoMonth", ()),
+    "out_of_control": ("out_of_control", "outOfControlReport", ()),
+    "month_project": ("stats_report", "monthYearProjectReport", (1,)),
+    "year_project": ("stats_report", "monthYearProjectReport", (2,)),
+    "month_batch": ("stats_report", "monthYearBatchReport", (1,)),
+    "year_batch": ("stats_report", "monthYearBatchReport", (2,)),
+}
+
+# The root of the repository, next to the report folders
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_lock = threading.Lock()
+
+# Matches the page objects of a pdf, but not the page tree
+_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+def load_report(report_type):
+    """
+    Imports the module of a report type. The report modules import their helpers from their own folder, so the folder
+    is put on the import path first
+    :param report_type: one of REPORT_TYPES
+    :return: the report module
+    """
+    if report_type not in REPORT_TYPES:
+        raise ValueError(f"Unknown report type {report_type!r}, expected one of {', '.join(REPORT_TYPES)}")
+    folder = os.path.join(_ROOT, REPORT_TYPES[report_type][0])
+
+    with _lock:
+        if folder not in sys.path:
+            sys.path.insert(0, folder)
+        return importlib.import_module(REPORT_TYPES[report_type][1])
+
+
+def prepare_worker():
+    """
+    Prepares a worker before its first report: the fonts are parsed and every report module is imported
+    :return:
+    """
+    warm_up()
+    for report_type in REPORT_TYPES:
+        load_report(report_type)
+
+
+def render_report(report_type, payload, output=bytes, timer=None):
+    """
+    Renders a report from its payload
+    :param report_type: one of REPORT_TYPES
+    :param payload: the quality control data of the report
+    :param output: where to write the pdf, as taken by pdf_gen. Defaults to returning the pdf bytes
+    :param timer: a StageTimer recording the stages of the report. Optional
+    :return: what pdf_gen returns for the output
+    """
+    module = load_report(report_type)
+    args = REPORT_TYPES[report_type][2]
+    return module.pdf_gen(payload, *args, output=output, timer=timer)
+
+
+def page_count(pdf_bytes):
+    """
+    Counts the pages of a pdf rendered by reportlab
+    :param pdf_bytes: the pdf
+    :return: the number of pages
+    """
+    return len(_PAGE_PATTERN.findall(pdf_bytes))
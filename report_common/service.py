@@ -0,0 +1,346 @@
+# Standard library imports
+import argparse
+import json
+import os
+import re
+import socketserver
+import sys
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local imports
+from report_common.ingest import load_payload
+from report_common.reports import REPORT_TYPES, prepare_worker, render_report
+
+_RENDER_PATH = re.compile(r"^/render/(?P<report_type>\w+)$")
+_REPORT_PATH = re.compile(r"^/reports/(?P<key>[0-9a-f]{32})$")
+_CONTENT_LENGTH = re.compile(r"^\s*[0-9]+\s*$")
+
+
+def _ping():
+    """
+    A job doing nothing, used to find out if the workers are up
+    :return: True
+    """
+    return True
+
+
+class _PayloadError(ValueError):
+    """
+    The payload of a request can't be read. Raised instead of the error of the parser, so that it isn't mistaken for a
+    failure of the service
+    """
+
+
+def _render_job(report_type, body, storage_dir=None):
+    """
+    Renders a report in a worker process
+    :param report_type: one of REPORT_TYPES
+    :param body: the json payload, as received
+    :param storage_dir: if given, the pdf is stored in this folder and its key returned instead of the pdf
+    :return: the pdf bytes, or the storage key of the pdf
+    :raise _PayloadError: if the body isn't a valid payload
+    """
+    try:
+        payload = load_payload(body, report_type)
+    except ValueError as e:
+        raise _PayloadError(f"{type(e).__name__}: {e}") from None
+
+    pdf_bytes = render_report(report_type, payload)
+    if storage_dir is None:
+        return pdf_bytes
+
+    key = uuid.uuid4().hex
+    with open(os.path.join(storage_dir, f"{key}.pdf"), "wb") as f:
+        f.write(pdf_bytes)
+    return key
+
+
+class RenderService:
+    """
+    A pool of warm worker processes with a bounded job queue. Requests beyond the queue size are turned away instead of
+    piling up
+    """
+
+    def __init__(self, workers=None, queue_size=64, timeout=60, storage_dir=None):
+        """
+        :param workers: the number of worker processes. Defaults to the number of cores
+        :param queue_size: the number of jobs accepted at the same time, running or waiting
+        :param timeout: the time in seconds a request waits for its report
+        :param storage_dir: the folder the stored reports are written to. Storing is off without it
+        """
+        self.timeout = timeout
+        self.storage_dir = storage_dir
+        if storage_dir is not None:
+            os.makedirs(storage_dir, exist_ok=True)
+
+        self.queue_size = queue_size
+        self._pending = 0
+        self._broken = False
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(max_workers=workers, initializer=prepare_worker)
+        self._ready = self._executor.submit(_ping)
+
+    def ready(self):
+        """
+        Checks if the workers are warm and the queue takes new jobs. A pool broken by a worker that died, or that failed
+        to start, never gets ready again
+        :return: True if a report can be rendered right away
+        """
+        if not self._ready.done() or self._ready.exception() is not None or self.broken():
+            return False
+        with self._lock:
+            return self._pending < self.queue_size
+
+    def broken(self):
+        """
+        Checks if the pool can no longer run jobs, e.g. because a worker was killed
+        :return: True if the pool is broken
+        """
+        # The executor also finds out about workers that died between jobs, which no future of ours sees
+        return self._broken or bool(getattr(self._executor, "_broken", False))
+
+    def render(self, report_type, body, store=False):
+        """
+        Queues a report and waits for it
+        :param report_type: one of REPORT_TYPES
+        :param body: the json payload, as received
+        :param store: if True, the pdf is stored and its key returned
+        :return: the pdf bytes or the storage key, or None if the queue is full
+        :raise _PayloadError: if the body isn't a valid payload
+        :raise BrokenProcessPool: if the pool can no longer run jobs
+        :raise TimeoutError: if the report took longer than the timeout
+        """
+        with self._lock:
+            if self._pending >= self.queue_size:
+                return None
+            self._pending += 1
+
+        # The job keeps its place in the queue until a worker is done with it, even if the request gave up waiting
+        try:
+            future = self._executor.submit(_render_job, report_type, body, self.storage_dir if store else None)
+        except BaseException as e:
+            self._job_done(None)
+            if isinstance(e, BrokenProcessPool):
+                self._broken = True
+            raise
+        future.add_done_callback(self._job_done)
+
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def _job_done(self, future):
+        """
+        Frees the place of a finished job in the queue, and notes if the job found the pool broken
+        :param future: the future of the job
+        :return:
+        """
+        if future is not None and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._broken = True
+        with self._lock:
+            self._pending -= 1
+
+    def stored_report(self, key):
+        """
+        Reads a stored report
+        :param key: the storage key returned by render
+        :return: the pdf bytes, or None if there is no such report
+        """
+        if self.storage_dir is None:
+            return None
+        try:
+            with open(os.path.join(self.storage_dir, f"{key}.pdf"), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def shutdown(self):
+        """
+        Stops the workers once the running jobs are done
+        :return:
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    The endpoints of the service:
+    POST /render/<report_type>  renders the json body and returns the pdf. With ?store=1, the pdf is stored and its
+                                key is returned instead
+    GET /reports/<key>          returns a stored pdf
+    GET /healthz                the service is up
+    GET /readyz                 the workers are warm and the queue takes new jobs
+    """
+    service = None
+
+    def do_GET(self):
+        """
+        Answers the health, readiness and stored report requests
+        :return:
+        """
+        path = self.path.split("?", 1)[0]
+        if path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/readyz":
+            ready = self.service.ready()
+            self._send_json(200 if ready else 503, {"ready": ready})
+        elif _REPORT_PATH.match(path):
+            pdf_bytes = self.service.stored_report(_REPORT_PATH.match(path)["key"])
+            if pdf_bytes is None:
+                self._send_json(404, {"error": "no such report"})
+            else:
+                self._send(200, "application/pdf", pdf_bytes)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        """
+        Answers the render requests
+        :return:
+        """
+        path, _, query = self.path.partition("?")
+        match = _RENDER_PATH.match(path)
+        if match is None:
+            self._send_json(404, {"error": "not found"})
+            return
+        report_type = match["report_type"]
+        if report_type not in REPORT_TYPES:
+            self._send_json(404, {"error": f"unknown report type {report_type}"})
+            return
+        store = "store=1" in query.split("&")
+        if store and self.service.storage_dir is None:
+            self._send_json(400, {"error": "the service has no storage"})
+            return
+
+        # The length of the body is checked before anything is read from the connection
+        length = self.headers.get("Content-Length")
+        if length is None or not _CONTENT_LENGTH.match(length):
+            self.close_connection = True
+            if length is None:
+                self._send_json(411, {"error": "Content-Length is required"})
+            else:
+                self._send_json(400, {"error": f"invalid Content-Length {length!r}"})
+            return
+        body = self.rfile.read(int(length))
+
+        try:
+            result = self.service.render(report_type, body, store)
+        except _PayloadError as e:
+            self._send_json(422, {"error": str(e)})
+            return
+        except TimeoutError:
+            self._send_json(504, {"error": "the report took too long"})
+            return
+        except BrokenProcessPool:
+            self._send_json(503, {"error": "the workers are down"})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        if result is None:
+            self._send_json(503, {"error": "the queue is full"})
+        elif store:
+            self._send_json(201, {"key": result})
+        else:
+            self._send(200, "application/pdf", result)
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def _send_json(self, status, content):
+        """
+        Sends a json response
+        :param status: the HTTP status
+        :param content: the content, serializable to json
+        :return:
+        """
+        self._send(status, "application/json", json.dumps(content, ensure_ascii=False).encode("utf-8"))
+
+    def _send(self, status, content_type, content):
+        """
+        Sends a response
+        :param status: the HTTP status
+        :param content_type: the content type
+        :param content: the content bytes
+        :return:
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    The HTTP server, listening on a Unix socket
+    """
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+
+def make_server(service, host="127.0.0.1", port=8080, socket_path=None):
+    """
+    Creates the HTTP server of a render service
+    :param service: the RenderService answering the requests
+    :param host: the address to listen on
+    :param port: the port to listen on
+    :param socket_path: a Unix socket to listen on instead of the address and port
+    :return: the server, ready to serve_forever
+    """
+    handler = type("RequestHandler", (_RequestHandler,), {"service": service})
+    if socket_path is None:
+        return ThreadingHTTPServer((host, port), handler)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    return _UnixHTTPServer(socket_path, handler)
+
+
+def main(argv=None):
+    """
+    The command line entry point
+    :param argv: the command line arguments. Defaults to sys.argv
+    :return: the exit status
+    """
+    parser = argparse.ArgumentParser(prog="python -m report_common.service",
+                                     description="Serve report rendering over HTTP from a pool of warm workers.")
+    parser.add_argument("--host", default="127.0.0.1", help="the address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8080, help="the port to listen on (default: %(default)s)")
+    parser.add_argument("--socket", default=None, help="a Unix socket to listen on instead of --host and --port")
+    parser.add_argument("--jobs", type=int, default=None, help="the number of worker processes (default: all cores)")
+    parser.add_argument("--queue", type=int, default=64,
+                        help="the number of reports accepted at the same time (default: %(default)s)")
+    parser.add_argument("--timeout", type=float, default=60,
+                        help="the time in seconds a request waits for its report (default: %(default)s)")
+    parser.add_argument("--storage", default=None, help="the folder ?store=1 reports are written to")
+    args = parser.parse_args(argv)
+
+    service = RenderService(args.jobs, args.queue, args.timeout, args.storage)
+    server = make_server(service, args.host, args.port, args.socket)
+    print(f"Serving reports on {args.socket or f'http://{args.host}:{args.port}'}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
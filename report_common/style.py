@@ -0,0 +1,130 @@
+# External library imports
+from reportlab.lib import colors
+from reportlab.platypus.tables import CellStyle
+
+# The cell attributes set by each style command, as far as the highlight rules are concerned
+_FONT_OPS = ("FONT", "FONTNAME", "FACE")
+_COLOR_OPS = ("TEXTCOLOR",)
+
+
+class StyleCompiler:
+    """
+    Collects the conditional formatting of a page and compiles it into a single list of style commands. Cells that end
+    up looking the same as under the base style don't produce any command, and neighbouring cells of a row with the
+    same formatting share one command, so the whole page is styled with a single setStyle call.
+    """
+
+    def __init__(self, base_style, table_data):
+        """
+        :param base_style: the TableStyle already applied to the table
+        :param table_data: the data drawn within the table
+        """
+        self.n_rows = len(table_data)
+        self.n_cols = len(table_data[0]) if table_data else 0
+        self.cells = {}
+
+        # Only the commands that set the font or the text color matter when comparing against the base style. The
+        # last command covering a cell wins, so they are kept in reverse order
+        commands = base_style.getCommands() if base_style is not None else []
+        self._base = [cmd for cmd in reversed(commands) if cmd[0] in _FONT_OPS + _COLOR_OPS]
+        default = CellStyle("default")
+        self._default_font = default.fontname
+        self._default_color = colors.toColor(default.color)
+
+    def highlight(self, col, row, text_color, font_name):
+        """
+        Sets the text color and font of a cell. A later call on the same cell replaces the earlier one
+        :param col: the column of the cell
+        :param row: the row of the cell
+        :param text_color: the text color
+        :param font_name: the font name
+        :return:
+        """
+        self.cells[(row, col)] = (colors.toColor(text_color), font_name)
+
+    def commands(self):
+        """
+        Compiles the highlighted cells into style commands
+        :return: a list of style commands, containing only what differs from the base style
+        """
+        # Work out what has to change in every cell
+        changes = {}
+        for (row, col), (text_color, font_name) in self.cells.items():
+            base_color, base_font = self._base_style(col, row)
+            change = (text_color if text_color != base_color else None, font_name if font_name != base_font else None)
+            if change != (None, None):
+                changes[(row, col)] = change
+
+        # Merge the runs of neighbouring cells of a row that get the same change
+        commands = []
+        run_start = run_end = run_change = None
+        for row, col in sorted(changes):
+            change = changes[(row, col)]
+            if run_change is not None and (row, col - 1) == run_end and change == run_change:
+                run_end = (row, col)
+                continue
+            commands.extend(_run_commands(run_start, run_end, run_change))
+            run_start = run_end = (row, col)
+            run_change = change
+        commands.extend(_run_commands(run_start, run_end, run_change))
+
+        return commands
+
+    def apply(self, table):
+        """
+        Applies the compiled commands to the table with a single setStyle call
+        :param table: the table of the page
+        :return:
+        """
+        commands = self.commands()
+        if commands:
+            table.setStyle(commands)
+
+    def _base_style(self, col, row):
+        """
+        Resolves the text color and font a cell gets from the base style
+        :param col: the column of the cell
+        :param row: the row of the cell
+        :return: the text color and the font name
+        """
+        text_color = font_name = None
+        for cmd in self._base:
+            (sc, sr), (ec, er) = cmd[1], cmd[2]
+            if isinstance(sr, str) or isinstance(er, str):
+                continue
+            sc, ec = sc % self.n_cols, ec % self.n_cols
+            sr, er = sr % self.n_rows, er % self.n_rows
+            if not (sc <= col <= ec and sr <= row <= er):
+                continue
+
+            if cmd[0] in _COLOR_OPS and text_color is None:
+                text_color = colors.toColor(cmd[3])
+            elif cmd[0] in _FONT_OPS and font_name is None:
+                font_name = cmd[3]
+            if text_color is not None and font_name is not None:
+                break
+
+        return (text_color if text_color is not None else self._default_color,
+                font_name if font_name is not None else self._default_font)
+
+
+def _run_commands(start, end, change):
+    """
+    Builds the style commands of a run of cells
+    :param start: the (row, column) of the first cell of the run
+    :param end: the (row, column) of the last cell of the run
+    :param change: the text color and the font name to be set. None where the base style is kept
+    :return: a list of style commands
+    """
+    if change is None:
+        return []
+
+    (row, first_col), (_, last_col) = start, end
+    text_color, font_name = change
+    commands = []
+    if text_color is not None:
+        commands.append(('TEXTCOLOR', (first_col, row), (last_col, row), text_color))
+    if font_name is not None:
+        commands.append(('FONTNAME', (first_col, row), (last_col, row), font_name))
+
+    return commands
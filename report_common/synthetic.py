@@ -0,0 +1,247 @@
+# Standard library imports
+import random
+
+# Analyte names of different widths, mixing Chinese and latin text like the real data does
+_ANALYTES = ["葡萄糖", "总胆固醇", "甘油三酯", "高密度脂蛋白胆固醇", "丙氨酸氨基转移酶(ALT)", "AST", "肌酐(Crea)", "尿素氮",
+             "总蛋白", "白蛋白", "钾离子 K+", "钠离子 Na+", "C反应蛋白 hs-CRP", "铁", "镁", "糖化血红蛋白 HbA1c"]
+
+# The statistics of a level in the project and batch reports
+_LEVEL_STATS = ["testMean", "testSd", "testCv", "monthMean", "monthSd", "monthCv", "monthUncontrolledDataCount",
+                "monthControlRate", "controlMean", "controlSd", "controlCv", "totalMean", "totalSd", "totalCv",
+                "totalDataCount", "totalUncontrolledRate", "goalCv", "goalSd"]
+
+
+def _year_months(count, start_year=2023, start_month=1):
+    """
+    Lists consecutive months
+    :param count: the number of months
+    :param start_year: the year of the first month
+    :param start_month: the first month
+    :return: a list of yyyy-mm strings
+    """
+    months = []
+    for i in range(count):
+        year, month = divmod(start_month - 1 + i, 12)
+        months.append(f"{start_year + year}-{month + 1:02d}")
+    return months
+
+
+def _analyte_name(i, name_length):
+    """
+    Builds the name of an analyte
+    :param i: the index of the analyte
+    :param name_length: how many times the base name is repeated, to make long, wrapping names
+    :return: the name
+    """
+    return _ANALYTES[i % len(_ANALYTES)] * name_length
+
+
+def _header(rng, lab_name_length, summary_lines, lot=True):
+    """
+    Builds the fields of the header box shared by every report
+    :param rng: the random generator
+    :param lab_name_length: how many times the laboratory name is repeated
+    :param summary_lines: the number of lines of the summary
+    :param lot: if True, the lot number, quality control and expiry date fields are added
+    :return: the header fields
+    """
+    header = {"reportCode": f"QC-{rng.randrange(10 ** 8):08d}",
+              "startDateStr": "2023.01.01",
+              "endDateStr": "2023.12.31",
+              "kitsName": "罗氏 cobas c701",
+              "laboratoryName": "第一人民医院检验科" * lab_name_length,
+              "laboratoryRelation": "检验科",
+              "summary": "\n".join(f"{i + 1}. 本期质控总体良好, 个别项目CV偏高, 需持续关注。" for i in range(summary_lines))}
+    if lot:
+        header.update({"batchCode": f"LOT{rng.randrange(10 ** 5):05d}",
+                       "qualityControls": "伯乐质控品(Bio-Rad)(水平1)",
+                       "batchExpirationDateStr": "2024.06.30"})
+    return header
+
+
+def cv_payload(seed=0, analytes=30, levels=3, months=12, name_length=1, lab_name_length=1, summary_lines=2,
+               missing_rate=0.1):
+    """
+    Generates the payload of the yearly CV report (cvDataList)
+    :param seed: the seed of the random generator. The same arguments always give the same payload
+    :param analytes: the number of analytes
+    :param levels: the number of levels of every analyte
+    :param months: the number of months with data, from the start of the report
+    :param name_length: how many times the analyte names are repeated
+    :param lab_name_length: how many times the laboratory name is repeated
+    :param summary_lines: the number of lines of the summary
+    :param missing_rate: the share of months without data
+    :return: the payload
+    """
+    rng = random.Random(seed)
+    payload = _header(rng, lab_name_length, summary_lines)
+    year_months = _year_months(months)
+    payload["cvDataList"] = [
+        {"analytesName": _analyte_name(i, name_length),
+         "target": round(rng.uniform(2, 6), 2),
+         "levelData": [{"level": f"水平{j + 1}",
+                        "dataList": [{"yearMonth": month, "cv": rng.uniform(1, 8)} for month in year_months
+                                     if rng.random() >= missing_rate]}
+                       for j in range(levels)]}
+        for i in range(analytes)]
+    return payload
+
+
+def cv_two_month_payload(seed=0, analytes=30, levels=2, months=2, name_length=1, lab_name_length=1, summary_lines=2,
+                         missing_rate=0.0):
+    """
+    Generates the payload of the bi-monthly CV report (projectMonthDataList)
+    :param seed: the seed of the random generator. The same arguments always give the same payload
+    :param analytes: the number of analytes
+    :param levels: the number of levels of every analyte. A single level adds the CVR column to the report
+    :param months: the number of months compared
+    :param name_length: how many times the analyte names are repeated
+    :param lab_name_length: how many times the laboratory name is repeated
+    :param summary_lines: the number of lines of the summary
+    :param missing_rate: the share of months without data
+    :return: the payload
+    """
+    rng = random.Random(seed)
+    payload = _header(rng, lab_name_length, summary_lines)
+    year_months = _year_months(months)
+    payload["levelList"] = [j + 1 for j in range(levels)]
+    payload["projectMonthDataList"] = [
+        {"analytesName": _analyte_name(i, name_length),
+         "monthDataList": [{"level": j + 1,
+                            "target": round(rng.uniform(2, 6), 2),
+                            "monthData": [{"yearMonth": month, "mean": rng.uniform(1, 100), "cv": rng.uniform(1, 8),
+                                           "dataCount": rng.randint(1, 30)} for month in year_months
+                                          if rng.random() >= missing_rate]}
+                           for j in range(levels)]}
+        for i in range(analytes)]
+    return payload
+
+
+def out_of_control_payload(seed=0, analytes=30, points=3, action_logs=2, name_length=1, lab_name_length=1,
+                           summary_lines=2, missing_rate=0.0):
+    """
+    Generates the payload of the out of control report (projectDataList)
+    :param seed: the seed of the random generator. The same arguments always give the same payload
+    :param analytes: the number of analytes
+    :param points: the number of out of control points of every analyte
+    :param action_logs: the maximum number of actions logged for a point
+    :param name_length: how many times the analyte names are repeated
+    :param lab_name_length: how many times the laboratory name is repeated
+    :param summary_lines: the number of lines of the summary
+    :param missing_rate: the share of points without a remark
+    :return: the payload
+    """
+    rng = random.Random(seed)
+    payload = _header(rng, lab_name_length, summary_lines)
+    payload["projectDataList"] = []
+    for i in range(analytes):
+        point_data = []
+        for j in range(points):
+            point = {"level": f"水平{j % 3 + 1}",
+                     "createTime": f"2023-03-{j % 28 + 1:02d}",
+                     "pointValue": rng.uniform(1, 100),
+                     "mean": rng.uniform(1, 100),
+                     "sd": rng.uniform(0.1, 3),
+                     "zPoint": rng.uniform(-4, 4),
+                     "acceptable": rng.randint(0, 1),
+                     "operationUserName": "张三" * (1 + j % 2),
+                     "spcRule": rng.choice(["1-2s", "1-3s", "2-2s", "R-4s", "4-1s", "10x"]),
+                     "actionLogList": [{"actionDesc": "重新测定质控品并校准仪器" * (1 + k % 2),
+                                        "operationUserName": "李四",
+                                        "createTime": f"2023-03-{j % 28 + 1:02d} 10:{k % 60:02d}:00"}
+                                       for k in range(rng.randint(0, action_logs))]}
+            if rng.random() >= missing_rate:
+                point["remark"] = "已处理"
+            point_data.append(point)
+        payload["projectDataList"].append({"analytesName": _analyte_name(i, name_length),
+                                           "pointDataList": point_data})
+    return payload
+
+
+def _level_data(rng, j, missing_rate):
+    """
+    Generates the statistics of a level for the project and batch reports
+    :param rng: the random generator
+    :param j: the index of the level
+    :param missing_rate: the share of statistics left out
+    :return: the level data
+    """
+    level = {"level": f"水平{j + 1}", "monthDataCount": rng.randint(1, 30)}
+    for key in _LEVEL_STATS:
+        value = rng.uniform(0.5, 10)
+        if rng.random() >= missing_rate:
+            level[key] = value
+    return level
+
+
+def project_payload(seed=0, analytes=30, levels=3, name_length=1, lab_name_length=1, summary_lines=2,
+                    missing_rate=0.0):
+    """
+    Generates the payload of the monthly and yearly project reports (testProjectList)
+    :param seed: the seed of the random generator. The same arguments always give the same payload
+    :param analytes: the number of analytes
+    :param levels: the number of levels of every analyte
+    :param name_length: how many times the analyte names are repeated
+    :param lab_name_length: how many times the laboratory name is repeated
+    :param summary_lines: the number of lines of the summary
+    :param missing_rate: the share of statistics left out
+    :return: the payload
+    """
+    rng = random.Random(seed)
+    payload = _header(rng, lab_name_length, summary_lines)
+    payload["testProjectList"] = [
+        {"analytesName": _analyte_name(i, name_length),
+         "measureUnit": "mmol/L",
+         "levelDataList": [_level_data(rng, j, missing_rate) for j in range(levels)]}
+        for i in range(analytes)]
+    return payload
+
+
+def batch_payload(seed=0, batches=4, analytes=10, levels=3, name_length=1, lab_name_length=1, summary_lines=2,
+                  missing_rate=0.0):
+    """
+    Generates the payload of the monthly and yearly batch reports (batchManageList)
+    :param seed: the seed of the random generator. The same arguments always give the same payload
+    :param batches: the number of lots
+    :param analytes: the number of analytes of every lot
+    :param levels: the number of levels of every analyte
+    :param name_length: how many times the analyte names are repeated
+    :param lab_name_length: how many times the laboratory name is repeated
+    :param summary_lines: the number of lines of the summary
+    :param missing_rate: the share of statistics left out
+    :return: the payload
+    """
+    rng = random.Random(seed)
+    payload = _header(rng, lab_name_length, summary_lines, lot=False)
+    payload["batchManageList"] = [
+        {"batchCode": f"LOT{b:05d}",
+         "testProjectList": [{"analytesName": _analyte_name(i, name_length),
+                              "levelDataList": [_level_data(rng, j, missing_rate) for j in range(levels)]}
+                             for i in range(analytes)]}
+        for b in range(batches)]
+    return payload
+
+
+# The payload generator of every report type
+PAYLOADS = {
+    "cv": cv_payload,
+    "cv_two_month": cv_two_month_payload,
+    "out_of_control": out_of_control_payload,
+    "month_project": project_payload,
+    "year_project": project_payload,
+    "month_batch": batch_payload,
+    "year_batch": batch_payload,
+}
+
+
+def make_payload(report_type, seed=0, **kwargs):
+    """
+    Generates the payload of a report type
+    :param report_type: one of PAYLOADS
+    :param seed: the seed of the random generator
+    :param kwargs: the sizes taken by the generator of the report type
+    :return: the payload
+    """
+    if report_type not in PAYLOADS:
+        raise ValueError(f"Unknown report type {report_type!r}, expected one of {', '.join(PAYLOADS)}")
+    return PAYLOADS[report_type](seed=seed, **kwargs)
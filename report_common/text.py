@@ -0,0 +1,20 @@
+# Local imports
+from report_common.measure import char_widths
+from report_common.pagination import fit_pages
+
+
+def split_text(text, max_width, font_name, font_size):
+    """
+    Splits a text into as many lines as it needs to fit within max_width. Each break is found by bisection on the
+    cumulative glyph widths of the text, so long names are split without re-measuring every prefix.
+    :param text: the text to be split
+    :param max_width: the available width of a line
+    :param font_name: the name of the font the text is drawn with
+    :param font_size: the font size the text is drawn with
+    :return: a list of lines. A text that fits is returned as a single line
+    """
+    breaks = fit_pages(char_widths(text, font_name, font_size), max_width)
+    if len(breaks) <= 1:
+        return [text]
+
+    return [text[start:stop] for start, stop in zip([0] + breaks, breaks)]
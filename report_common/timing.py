@@ -0,0 +1,74 @@
+# Standard library imports
+import time
+
+# The stages of a report. "table" is the construction of the page tables, "styling" the conditional rules of the report
+STAGES = ["fonts", "header", "extraction", "measurement", "table", "styling", "drawing", "save"]
+
+
+class StageTimer:
+    """
+    Records the wall time and the number of calls of every stage of a report. The report marks the end of every stage
+    with lap, and the time since the previous lap is charged to it, so the stages add up to the whole report
+    """
+
+    def __init__(self, sink=None):
+        """
+        :param sink: a callable taking the report type and the results, called once the report is saved. Optional,
+        the results can also be read from the timer afterwards
+        """
+        self.sink = sink
+        self._stages = {}
+        self._mark = None
+
+    def start(self):
+        """
+        Starts timing, at the beginning of a report
+        :return:
+        """
+        self._mark = time.perf_counter()
+
+    def lap(self, stage):
+        """
+        Ends a stage
+        :param stage: the stage that just ran
+        :return:
+        """
+        now = time.perf_counter()
+        entry = self._stages.setdefault(stage, [0.0, 0])
+        entry[0] += now - self._mark
+        entry[1] += 1
+        self._mark = now
+
+    def results(self):
+        """
+        Gives the recorded stages
+        :return: a dict with the seconds and calls of every stage
+        """
+        return {stage: {"seconds": seconds, "calls": calls} for stage, (seconds, calls) in self._stages.items()}
+
+    def finish(self, report_type):
+        """
+        Hands the results to the sink, at the end of a report
+        :param report_type: the report type
+        :return:
+        """
+        if self.sink is not None:
+            self.sink(report_type, self.results())
+
+
+class _NullTimer:
+    """
+    The timer of reports rendered without instrumentation. Does nothing
+    """
+
+    def start(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+    def finish(self, report_type):
+        pass
+
+
+NULL_TIMER = _NullTimer()
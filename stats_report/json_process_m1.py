@@ -1,3 +1,18 @@
+# Local imports
+from report_common.columns import ColumnStore, LABEL, DECIMAL, COUNT
+
+# The statistics of a level, in the order of their columns after the level, and how each one is drawn
+LEVEL_STATS = [("testMean", DECIMAL), ("testSd", DECIMAL), ("testCv", DECIMAL), ("monthMean", DECIMAL),
+               ("monthSd", DECIMAL), ("monthCv", DECIMAL), ("monthDataCount", COUNT),
+               ("monthUncontrolledDataCount", COUNT), ("monthControlRate", DECIMAL), ("controlMean", DECIMAL),
+               ("controlSd", DECIMAL), ("controlCv", DECIMAL), ("totalMean", DECIMAL), ("totalSd", DECIMAL),
+               ("totalCv", DECIMAL), ("totalDataCount", COUNT), ("totalUncontrolledRate", DECIMAL),
+               ("goalCv", DECIMAL), ("goalSd", DECIMAL)]
+
+# The kind of every column: the two test columns, the level and the statistics
+COLUMN_KINDS = [LABEL, LABEL, LABEL] + [kind for _, kind in LEVEL_STATS]
+
+
 # Extracts the information from the json file and returns a list that can be expressed in a table
 def json_data_extract(data):
     """
@@ -5,66 +20,43 @@ def json_data_extract(data):
     :param data: a JSON file
     :return: a list of lists where each element is a row of data
     """
-    outer_list = []
-    layer1 = data.get("testProjectList", "")
-    tests = len(layer1)
-    format_index = [3, 4, 5, 6, 7, 8, 11, 12, 13, 14, 15, 16, 17, 19, 20, 21]
+    return list(iter_rows(data))
+
+
+def iter_rows(data):
+    """
+    Generates the rows of the table one at a time, formatted as they are read from the column store
+    :param data: a JSON file
+    :return: a generator of rows, each a list of cells
+    """
+    return column_store(data).rows()
 
-    for i in range(tests):
-        inner_list = []
-        first = True
-        layer2 = layer1[i].get("levelDataList", "")
-        details = len(layer2)
 
-        for j in range(details):
+def column_store(data):
+    """
+    Extracts the table into a column store. The statistics are kept as numbers and only formatted when the rows are
+    read
+    :param data: a JSON file
+    :return: a ColumnStore of the rows
+    """
+    store = ColumnStore(COLUMN_KINDS)
+    for test in data.get("testProjectList", ""):
+        first = True
+        for level_data in test.get("levelDataList", ""):
             # Add the two values only on the first occurrence of the test. Every other instance needs to be empty
             if first:
-                inner_list.append(layer1[i].get("analytesName", ""))
-                inner_list.append(layer1[i].get("measureUnit", ""))
+                row = [test.get("analytesName", ""), test.get("measureUnit", "")]
             else:
-                inner_list.append("")
-                inner_list.append("")
+                row = ["", ""]
 
             # Extracted using the get method to handle missing keys
-            inner_list.append(layer2[j].get("level", ""))
-            inner_list.append(layer2[j].get("testMean", ""))
-            inner_list.append(layer2[j].get("testSd", ""))
-            inner_list.append(layer2[j].get("testCv", ""))
-            inner_list.append(layer2[j].get("monthMean", ""))
-            inner_list.append(layer2[j].get("monthSd", ""))
-            inner_list.append(layer2[j].get("monthCv", ""))
-            inner_list.append(layer2[j].get("monthDataCount", ""))
-            inner_list.append(layer2[j].get("monthUncontrolledDataCount", ""))
-            inner_list.append(layer2[j].get("monthControlRate", ""))
-            inner_list.append(layer2[j].get("controlMean", ""))
-            inner_list.append(layer2[j].get("controlSd", ""))
-            inner_list.append(layer2[j].get("controlCv", ""))
-            inner_list.append(layer2[j].get("totalMean", ""))
-            inner_list.append(layer2[j].get("totalSd", ""))
-            inner_list.append(layer2[j].get("totalCv", ""))
-            inner_list.append(layer2[j].get("totalDataCount", ""))
-            inner_list.append(layer2[j].get("totalUncontrolledRate", ""))
-            inner_list.append(layer2[j].get("goalCv", ""))
-            inner_list.append(layer2[j].get("goalSd", ""))
-
-            formatted_list = []
-            for idx in range(len(inner_list)):
-                value = inner_list[idx]
-                if idx in format_index:
-                    if isinstance(value, (int, float)):
-                        formatted_value = "{:.2f}".format(value)
-                        formatted_list.append(formatted_value)
-                    else:
-                        formatted_list.append(value)
-                else:
-                    formatted_list.append(value)
-
-            outer_list.append(formatted_list)
-            inner_list = []
+            row.append(level_data.get("level", ""))
+            row.extend(level_data.get(key, "") for key, _ in LEVEL_STATS)
+            store.append(row)
             first = False
 
-    if not outer_list:
+    if not len(store):
         for i in range(2):
-            outer_list.append([""]*22)
+            store.append([""]*22)
 
-    return outer_list
+    return store
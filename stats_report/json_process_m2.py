@@ -1,3 +1,8 @@
+# Local imports
+from json_process_m1 import LEVEL_STATS, COLUMN_KINDS
+from report_common.columns import ColumnStore
+
+
 # Extracts the information from the json file and returns a list that can be expressed in a table
 def json_data_extract(data):
     """
@@ -5,75 +10,44 @@ def json_data_extract(data):
     :param data: a JSON file
     :return: a list of lists where each element is a row of data
     """
-    outer_list = []
-    batch_layer = data.get("batchManageList", "")
-    batches = len(batch_layer)
-    format_index = [3, 4, 5, 6, 7, 8, 11, 12, 13, 14, 15, 16, 17, 19, 20, 21]
-    for x in range(batches):
-        batch_first = True
-        layer1 = batch_layer[x]
-        interm_layer = layer1.get("testProjectList", "")
-        tests = len(interm_layer)
+    return list(iter_rows(data))
 
-        for i in range(tests):
-            inner_list = []
-            first = True
-            layer2 = interm_layer[i].get("levelDataList", "")
-            details = len(layer2)
 
-            for j in range(details):
-                # Add the two values only on the first occurrence of the test. Every other instance needs to be empty
-                if batch_first:
-                    inner_list.append(layer1.get("batchCode", ""))
-                else:
-                    inner_list.append("")
+def iter_rows(data):
+    """
+    Generates the rows of the table one at a time, formatted as they are read from the column store
+    :param data: a JSON file
+    :return: a generator of rows, each a list of cells
+    """
+    return column_store(data).rows()
 
-                if first:
-                    inner_list.append(interm_layer[i].get("analytesName", ""))
-                else:
-                    inner_list.append("")
 
-                # Extracted using the get method to handle missing keys
-                inner_list.append(layer2[j].get("level", ""))
-                inner_list.append(layer2[j].get("testMean", ""))
-                inner_list.append(layer2[j].get("testSd", ""))
-                inner_list.append(layer2[j].get("testCv", ""))
-                inner_list.append(layer2[j].get("monthMean", ""))
-                inner_list.append(layer2[j].get("monthSd", ""))
-                inner_list.append(layer2[j].get("monthCv", ""))
-                inner_list.append(layer2[j].get("monthDataCount", ""))
-                inner_list.append(layer2[j].get("monthUncontrolledDataCount", ""))
-                inner_list.append(layer2[j].get("monthControlRate", ""))
-                inner_list.append(layer2[j].get("controlMean", ""))
-                inner_list.append(layer2[j].get("controlSd", ""))
-                inner_list.append(layer2[j].get("controlCv", ""))
-                inner_list.append(layer2[j].get("totalMean", ""))
-                inner_list.append(layer2[j].get("totalSd", ""))
-                inner_list.append(layer2[j].get("totalCv", ""))
-                inner_list.append(layer2[j].get("totalDataCount", ""))
-                inner_list.append(layer2[j].get("totalUncontrolledRate", ""))
-                inner_list.append(layer2[j].get("goalCv", ""))
-                inner_list.append(layer2[j].get("goalSd", ""))
-
-                formatted_list = []
-                for idx in range(len(inner_list)):
-                    value = inner_list[idx]
-                    if idx in format_index:
-                        if isinstance(value, (int, float)):
-                            formatted_value = "{:.2f}".format(value)
-                            formatted_list.append(formatted_value)
-                        else:
-                            formatted_list.append(value)
-                    else:
-                        formatted_list.append(value)
+def column_store(data):
+    """
+    Extracts the table into a column store. The statistics are kept as numbers and only formatted when the rows are
+    read
+    :param data: a JSON file
+    :return: a ColumnStore of the rows
+    """
+    store = ColumnStore(COLUMN_KINDS)
+    for batch in data.get("batchManageList", ""):
+        batch_first = True
+        for test in batch.get("testProjectList", ""):
+            first = True
+            for level_data in test.get("levelDataList", ""):
+                # Add the two values only on the first occurrence of the batch and of the test. Every other instance
+                # needs to be empty
+                row = [batch.get("batchCode", "") if batch_first else "", test.get("analytesName", "") if first else ""]
 
-                outer_list.append(formatted_list)
-                inner_list = []
+                # Extracted using the get method to handle missing keys
+                row.append(level_data.get("level", ""))
+                row.extend(level_data.get(key, "") for key, _ in LEVEL_STATS)
+                store.append(row)
                 first = False
                 batch_first = False
 
-    if not outer_list:
+    if not len(store):
         for i in range(2):
-            outer_list.append([""]*22)
+            store.append([""]*22)
 
-    return outer_list
+    return store
@@ -0,0 +1,9 @@
+# Standard library imports
+import os
+import sys
+
+# The report modules import their helpers from their own folder and report_common from the root of the repository
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in [_ROOT] + [os.path.join(_ROOT, name) for name in ("cv_report", "cv_two_month")]:
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
@@ -0,0 +1,93 @@
+# Standard library imports
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# External library imports
+import pytest
+
+# Local imports
+from report_common import batch
+from report_common.batch import find_jobs, run_batch
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("{}", encoding="utf-8")
+
+
+def test_names_of_a_directory(tmp_path):
+    for name in ("b", "a", "c"):
+        _touch(tmp_path / f"{name}.json")
+    assert [name for name, path, line in find_jobs(str(tmp_path))] == ["a", "b", "c"]
+
+
+def test_same_file_name_in_different_folders(tmp_path):
+    for path in ("2024/jan/lab.json", "2024/feb/lab.json", "2024/feb/other.json"):
+        _touch(tmp_path / path)
+    names = [name for name, path, line in find_jobs(str(tmp_path / "2024" / "*" / "*.json"))]
+    assert names == ["feb_lab", "other", "jan_lab"]
+
+
+def test_names_differing_only_by_case(tmp_path):
+    _touch(tmp_path / "x" / "Lab.json")
+    _touch(tmp_path / "y" / "lab.json")
+    assert sorted(name for name, path, line in find_jobs(str(tmp_path / "*" / "*.json"))) == ["x_Lab", "y_lab"]
+
+
+def test_collisions_left_after_disambiguation_are_rejected(tmp_path):
+    _touch(tmp_path / "a" / "b.json")
+    _touch(tmp_path / "a_b.json")
+    _touch(tmp_path / "c" / "b.json")
+    with pytest.raises(ValueError):
+        find_jobs(str(tmp_path / "**" / "*b.json"))
+
+
+def test_ndjson_lines_are_read_lazily(tmp_path):
+    source = tmp_path / "payloads.ndjson"
+    # A line far beyond the first read that can't be decoded only fails when it is reached
+    source.write_bytes(b'{"a": 1}\n\n{"a": 2}\n' + b" " * (1 << 20) + b"\n\xff\xfe\n")
+    jobs = find_jobs(str(source))
+    assert next(jobs) == ("payloads-1", str(source), '{"a": 1}\n')
+    assert next(jobs) == ("payloads-3", str(source), '{"a": 2}\n')
+    with pytest.raises(UnicodeDecodeError):
+        list(jobs)
+
+
+class _Executor(ThreadPoolExecutor):
+    """
+    Runs the jobs on threads, without the initializer of the worker processes
+    """
+
+    def __init__(self, max_workers, initializer, initargs):
+        super().__init__(max_workers=max_workers)
+
+
+def test_jobs_are_handed_to_the_pool_through_a_window(monkeypatch, tmp_path):
+    lock = threading.Lock()
+    in_flight = []
+    pulled = finished = 0
+
+    def render(report_type, job, out_dir):
+        nonlocal finished
+        time.sleep(0.002)
+        with lock:
+            finished += 1
+        return {"name": job[0], "error": None if job[0] % 3 else "failed"}
+
+    def jobs():
+        nonlocal pulled
+        for number in range(50):
+            with lock:
+                in_flight.append(pulled - finished)
+                pulled += 1
+            yield number, None, None
+
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", _Executor)
+    monkeypatch.setattr(batch, "_render_job", render)
+    summary = io.StringIO()
+    assert run_batch("cv", jobs(), str(tmp_path), summary, workers=2) == (50, 17)
+    assert max(in_flight) <= 4
+    assert sorted(json.loads(line)["name"] for line in summary.getvalue().splitlines()) == list(range(50))
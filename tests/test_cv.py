@@ -0,0 +1,89 @@
+# Local imports
+from json_process_cv import CvRows, iter_rows
+
+
+def _payload(cv_data):
+    return {"startDateStr": "2024.01.01", "cvDataList": cv_data}
+
+
+def _level(level, cvs):
+    return {"level": level, "dataList": [{"yearMonth": month, "cv": cv} for month, cv in cvs.items()]}
+
+
+def _mask(masks, row):
+    compared, above = masks
+    return [bool(is_compared) for is_compared in compared[row]], [bool(is_above) for is_above in above[row]]
+
+
+class _OnePass(dict):
+    """
+    A payload whose list of analytes can only be read once
+    """
+
+    def get(self, key, default=None):
+        value = dict.get(self, key, default)
+        if key == "cvDataList":
+            assert not getattr(self, "read", False), "the analytes were read twice"
+            self.read = True
+            return iter(value)
+        return value
+
+
+DATA = [
+    {"analytesName": "A", "target": 5, "levelData": [_level("L1", {"2024-01": 4.99, "2024-02": 5.004, "2024-03": 5.01}),
+                                                     _level("L2", {"2024-12": 7, "2025-01": 99})]},
+    {"analytesName": "B", "target": "", "levelData": [_level("L1", {"2024-01": 9})]},
+    {"analytesName": "C", "target": "2.5", "levelData": [_level("L1", {"2024-05": "3", "2024-06": "n/a",
+                                                                       "2024-07": None})]},
+]
+
+
+def test_rows_and_masks_from_a_single_pass():
+    rows = CvRows(_OnePass(_payload(DATA)))
+    pulled = list(rows)
+    assert pulled == list(iter_rows(_payload(DATA)))
+
+    # Pages are styled in order, each from the numbers of its own rows
+    first, second = rows.exceedance(0, 2), rows.exceedance(2, 4)
+
+    # 5.004 is drawn as 5.00, which isn't above the target
+    assert _mask(first, 0) == ([True] * 3 + [False] * 9, [False, False, True] + [False] * 9)
+    assert _mask(first, 1) == ([False] * 11 + [True], [False] * 11 + [True])
+
+    # A missing target compares nothing, text that reads as a number is compared
+    assert _mask(second, 0) == ([False] * 12, [False] * 12)
+    assert _mask(second, 1) == ([False] * 4 + [True] + [False] * 7, [False] * 4 + [True] + [False] * 7)
+
+
+def test_masks_of_pages_pulled_ahead():
+    rows = CvRows(_payload(DATA))
+    iterator = iter(rows)
+
+    # The layout engine pulls rows past the page it styles
+    next(iterator), next(iterator), next(iterator)
+    first = rows.exceedance(0, 1)
+    assert _mask(first, 0)[1][2]
+    next(iterator)
+    second = rows.exceedance(1, 4)
+    assert len(second[0]) == 3
+    assert _mask(second, 0)[1][11]
+
+
+def test_empty_report_pads_two_rows_without_highlights():
+    rows = CvRows(_payload([]))
+    assert list(rows) == [[""] * 16] * 2
+    assert _mask(rows.exceedance(0, 2), 1) == ([False] * 12, [False] * 12)
+
+
+def test_numbers_are_held_until_their_page_is_styled():
+    rows = CvRows(_payload([{"analytesName": f"A{number}", "target": 5, "levelData": [_level("L1", {"2024-01": 4})]}
+                            for number in range(100)]))
+    iterator = iter(rows)
+    held = []
+    for start in range(0, 100, 20):
+        for _ in range(20):
+            next(iterator)
+        held.append(len(rows._cvs))
+        rows.exceedance(start, start + 20)
+    assert held == [20] * 5
+    assert rows._cvs == rows._targets == []
@@ -0,0 +1,143 @@
+# Standard library imports
+import math
+
+# External library imports
+import pytest
+from reportlab.lib import colors
+
+# Local imports
+from cvTwoMonth import _color_changer
+from json_process_cv_two_month import compare_months, iter_rows, month_list
+
+
+def _month(year_month, mean, cv, count=10):
+    return {"yearMonth": year_month, "mean": mean, "cv": cv, "dataCount": count}
+
+
+def _payload(analytes, levels=2):
+    """
+    A payload of analytes given as (name, [(level, target, [month data])])
+    """
+    return {"levelList": list(range(levels)),
+            "projectMonthDataList": [{"analytesName": name,
+                                      "monthDataList": [{"level": level, "target": target, "monthData": months}
+                                                        for level, target, months in level_data]}
+                                     for name, level_data in analytes]}
+
+
+def test_level_with_only_the_second_month():
+    data = _payload([("A", [(1, 5, [_month("2024-01", 10, 2), _month("2024-02", 12, 3)]),
+                            (2, 5, [_month("2024-02", 20, 4, 7)])])])
+    assert month_list(data) == ["2024-01", "2024-02"]
+    assert list(iter_rows(data)) == [
+        ["A", "1", "10.00", "2.00", "10", "12.00", "3.00", "10", "20.00%", "50.00%", "5.00"],
+        ["", "2", "", "", "", "20.00", "4.00", "7", "", "", "5.00"],
+    ]
+
+
+def test_months_in_chronological_order_whatever_level_comes_first():
+    data = _payload([("A", [(1, 5, [_month("2024-02", 12, 3)]),
+                            (2, 5, [_month("2024-02", 20, 4), _month("2024-01", 10, 2)])])])
+    comparison = compare_months(data)
+    assert comparison.months == ["2024-01", "2024-02"]
+    assert comparison.means == [["", 10], [12, 20]]
+
+
+def test_duplicate_months_last_wins():
+    data = _payload([("A", [(1, 5, [_month("2024-01", 10, 2), _month("2024-02", 11, 2),
+                                    _month("2024-01", 20, 4, 3)])])])
+    comparison = compare_months(data)
+    assert comparison.means == [[20], [11]]
+    assert comparison.counts == [["3"], ["10"]]
+    assert list(iter_rows(data))[0][2:10] == ["20.00", "4.00", "3", "11.00", "2.00", "10", "-45.00%", "-50.00%"]
+
+
+@pytest.mark.parametrize("first, second, mean_diff, cv_diff, cvr", [
+    ((0, 2), (10, 3), "", "50.00%", "0.67"),
+    ((10, 0), (12, 3), "20.00%", "", "0.00"),
+    ((10, 2), (12, 0), "20.00%", "-100.00%", ""),
+    ((0, 0), (0, 0), "", "", ""),
+    (("", 2), (12, "n/a"), "", "", ""),
+])
+def test_zero_or_missing_baseline_leaves_the_cell_empty(first, second, mean_diff, cv_diff, cvr):
+    data = _payload([("A", [(1, 5, [_month("2024-01", *first), _month("2024-02", *second)])])], levels=1)
+    row = list(iter_rows(data))[0]
+    assert row[8:11] == [mean_diff, cv_diff, cvr]
+
+
+@pytest.mark.parametrize("levels", [1, 2])
+def test_three_month_layout_and_formatters(levels):
+    data = _payload([("A", [(1, 4, [_month("2024-03", 15, 2.5, 9), _month("2024-01", 10, 2, 7),
+                                    _month("2024-02", 12, 2.5, 8)])])], levels=levels)
+    comparison = compare_months(data, months=3)
+    assert comparison.months == ["2024-01", "2024-02", "2024-03"]
+    assert len(comparison.mean_diffs) == len(comparison.cv_diffs) == 2
+
+    row = list(comparison.rows())[0]
+    months = ["10.00", "2.00", "7", "12.00", "2.50", "8", "15.00", "2.50", "9"]
+    diffs = ["20.00%", "25.00%", "25.00%", "0.00%"]
+    if levels == 1:
+        assert row == ["A", "1", *months, *diffs, "0.80", "1.00", "4.00"]
+    else:
+        assert row == ["A", "1", *months, *diffs, "4.00"]
+
+
+def test_three_month_layout_of_an_empty_report():
+    # Like the two month report has always done, the padding rows leave out the CVR columns
+    rows = list(compare_months(_payload([], levels=1), months=3).rows())
+    assert rows == [[""] * 16] * 2
+
+
+class _Table:
+    """
+    Records the style commands applied to a table
+    """
+
+    def __init__(self):
+        self.commands = []
+
+    def setStyle(self, commands):
+        self.commands.extend(commands)
+
+
+def _highlighted(mean_diffs, cv_diffs):
+    """
+    The cells set in red by the rule, as (column, row). Neighbouring cells of a row share a command
+    """
+    table = _Table()
+    rows = [[""] * 11 for _ in mean_diffs]
+    _color_changer(table, rows, None, mean_diffs, cv_diffs)
+    return {(col, cmd[1][1]) for cmd in table.commands if cmd[0] == "TEXTCOLOR" and cmd[3] == colors.red
+            for col in range(cmd[1][0], cmd[2][0] + 1)}
+
+
+def _drawn_over_30(diff):
+    """
+    The rule of the baseline, on the percentage as it is drawn
+    """
+    return abs(float(f"{diff:.2f}")) > 30
+
+
+BOUNDARY = [30.0, -30.0, 30.005, -30.005, 30.0049, 30.0051, -30.0051, 29.995, 30.01, 0.3 * 100, -1000.0, 0.0]
+
+
+def test_30_percent_rule_on_the_drawn_percentage():
+    assert _highlighted(BOUNDARY, BOUNDARY) == {(col, row) for row, diff in enumerate(BOUNDARY)
+                                                for col in (8, 9) if _drawn_over_30(diff)}
+    assert _highlighted([30.0, 30.005, -30.01], [0, 0, 0]) == {(8, 2)}
+
+
+def test_30_percent_rule_skips_rows_without_both_differences():
+    assert _highlighted([math.nan, 50.0, 50.0], [50.0, math.nan, 50.0]) == {(8, 2), (9, 2)}
+
+
+def test_30_percent_rule_matches_the_drawn_rows():
+    months = [(100, 130), (100, 70), (100, 130.005), (100, 69.995), (3, 3.9), (3, 2.1), (7, 9.1), (1e-9, 1)]
+    data = _payload([("A", [(level, 5, [_month("2024-01", before, before), _month("2024-02", after, after)])
+                            for level, (before, after) in enumerate(months)])])
+    comparison = compare_months(data)
+    rows = list(comparison.rows())
+
+    expected = {(col, row) for row, cells in enumerate(rows) for col in (8, 9)
+                if abs(float(cells[col][:-1])) > 30}
+    assert _highlighted(comparison.mean_diffs[0], comparison.cv_diffs[0]) == expected
@@ -0,0 +1,177 @@
+# Standard library imports
+import io
+import json
+import random
+import tracemalloc
+
+# External library imports
+import pytest
+
+# Local imports
+from report_common import ingest
+from report_common.ingest import PROJECTIONS, load_payload, project
+
+
+class _Trickle:
+    """
+    A binary file handing out at most a few bytes per read, so every token of a document is cut by a chunk boundary
+    somewhere
+    """
+
+    def __init__(self, data, size):
+        self._data = io.BytesIO(data)
+        self._size = size
+
+    def read(self, size=-1):
+        return self._data.read(self._size if size < 0 else min(size, self._size))
+
+
+def _expected(document, report_type):
+    """
+    The projected payload, parsed in one go
+    """
+    return project(json.loads(document), PROJECTIONS[report_type][1])
+
+
+def _load(document, report_type, size):
+    return load_payload(_Trickle(document.encode("utf-8"), size), report_type)
+
+
+NUMBERS = [0, -0.0, 7, -12, 12.5, -0.125, 1e-7, -2.5E+12, 123456789012345678901234567890, 3.141592653589793]
+
+STRINGS = ["", "plain", "血糖 (mmol/L)", 'quote " and backslash \\', "escapes \n\t\u0001", "中\U0001f600",
+           "ends with a backslash \\"]
+
+
+@pytest.mark.parametrize("size", range(1, 8))
+def test_numbers_cut_by_chunk_boundaries(size):
+    items = [{"analytesName": "a", "target": number,
+              "levelData": [{"level": number, "dataList": [{"yearMonth": "2024-01", "cv": number}]}]}
+             for number in NUMBERS]
+    document = json.dumps({"reportCode": 12345, "cvDataList": items, "summary": -98.765})
+    assert _load(document, "cv", size) == _expected(document, "cv")
+
+
+@pytest.mark.parametrize("size", range(1, 8))
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_strings_cut_by_chunk_boundaries(size, ensure_ascii):
+    items = [{"analytesName": text, "target": "", "levelData": []} for text in STRINGS]
+    document = json.dumps({"reportCode": STRINGS[3], "cvDataList": items, "summary": STRINGS[5]},
+                          ensure_ascii=ensure_ascii)
+    assert _load(document, "cv", size) == _expected(document, "cv")
+
+
+@pytest.mark.parametrize("size", [1, 3, 1 << 16])
+def test_fields_after_the_list(size):
+    document = json.dumps({"cvDataList": [{"analytesName": "a", "levelData": []}],
+                           "reportCode": "R-1", "ignored": {"deep": [1, 2, 3]}, "summary": "after the list"})
+    payload = _load(document, "cv", size)
+    assert payload == _expected(document, "cv")
+    assert payload["reportCode"] == "R-1" and payload["summary"] == "after the list"
+    assert "ignored" not in payload
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 1 << 16])
+def test_byte_order_mark(size):
+    document = json.dumps({"reportCode": "BOM", "cvDataList": [], "summary": "总结"}, ensure_ascii=False)
+    data = b"\xef\xbb\xbf" + document.encode("utf-8")
+    assert load_payload(_Trickle(data, size), "cv") == _expected(document, "cv")
+
+
+def test_whitespace_and_empty_containers():
+    document = ' \n{ "reportCode" : "R" , "cvDataList" : [ ] ,\t"summary" : { } }\n '
+    assert _load(document, "cv", 2) == {"reportCode": "R", "cvDataList": [], "summary": {}}
+    assert _load("{}", "cv", 1) == {}
+
+
+def test_list_that_is_not_a_list_is_kept_as_it_is():
+    document = json.dumps({"cvDataList": None, "reportCode": "R"})
+    assert _load(document, "cv", 1) == {"cvDataList": None, "reportCode": "R"}
+
+
+@pytest.mark.parametrize("document", ['{"reportCode": "R", "cvDataList": [{"analytesName": "a"}',
+                                      '{"reportCode": 12', '{"reportCode" "R"}', '["not an object"]', ""])
+def test_broken_documents_raise(document):
+    with pytest.raises(json.JSONDecodeError):
+        _load(document, "cv", 3)
+
+
+def test_unknown_report_type():
+    with pytest.raises(ValueError):
+        load_payload(b"{}", "pie_chart")
+
+
+def _random_value(rng, depth):
+    """
+    A random json value: numbers, strings with escapes and CJK text, and nested containers
+    """
+    kind = rng.randrange(8 if depth < 3 else 5)
+    if kind == 0:
+        return rng.choice([None, True, False])
+    if kind == 1:
+        return rng.randint(-10 ** 12, 10 ** 12)
+    if kind == 2:
+        return rng.uniform(-1e6, 1e6) * rng.choice([1, 1e-9, 1e9])
+    if kind in (3, 4):
+        return "".join(rng.choice('ab"\\\n中文\U0001f600 9.e-') for _ in range(rng.randrange(6)))
+    if kind == 5:
+        return [_random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {rng.choice(["level", "cv", "yearMonth", "x", "中"]): _random_value(rng, depth + 1)
+            for _ in range(rng.randrange(4))}
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_random_documents_match_json_loads(seed):
+    rng = random.Random(seed)
+    document = {field: _random_value(rng, 1) for field in rng.sample(["reportCode", "summary", "kitsName", "other"], 3)}
+    document["cvDataList"] = [{"analytesName": _random_value(rng, 2), "target": _random_value(rng, 2),
+                               "levelData": [{"level": _random_value(rng, 2), "dataList": _random_value(rng, 1)}],
+                               "unused": _random_value(rng, 1)}
+                              for _ in range(rng.randrange(5))]
+    document["summary"] = _random_value(rng, 1)
+    text = json.dumps(document, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 1]))
+    assert _load(text, "cv", rng.randint(1, 7)) == _expected(text, "cv")
+
+
+def _padded_items(count, padding):
+    """
+    Items of the cv list carrying a large field the report doesn't read
+    """
+    return [{"analytesName": f"a{number}", "target": 5,
+             "levelData": [{"level": 1, "dataList": [{"yearMonth": "2024-01", "cv": 3.2}]}], "actionLog": "x" * padding}
+            for number in range(count)]
+
+
+@pytest.mark.parametrize("padding", [100, 50_000, 300_000])
+def test_buffer_holds_at_most_a_chunk_and_the_largest_item(monkeypatch, padding):
+    items = _padded_items(40, padding)
+    document = json.dumps({"reportCode": "R", "cvDataList": items, "summary": "s"}).encode("utf-8")
+    largest = max(len(json.dumps(item)) for item in items)
+
+    sizes = []
+    fill = ingest._JsonStream._fill
+
+    def recording_fill(stream, *args):
+        more = fill(stream, *args)
+        sizes.append(len(stream._buffer))
+        return more
+
+    monkeypatch.setattr(ingest._JsonStream, "_fill", recording_fill)
+    load_payload(document, "cv")
+    assert max(sizes) <= 2 * ingest._CHUNK_SIZE + 3 * largest
+
+
+def test_peak_memory_is_far_below_the_document(tmp_path):
+    source = tmp_path / "payload.json"
+    source.write_text(json.dumps({"reportCode": "R", "cvDataList": _padded_items(60, 300_000)}), encoding="utf-8")
+
+    tracemalloc.start()
+    try:
+        payload = load_payload(str(source), "cv")
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # The projected payload is kept whole, the document a few items at most
+    assert len(payload["cvDataList"]) == 60
+    assert peak < source.stat().st_size / 5
@@ -0,0 +1,100 @@
+# Standard library imports
+import os
+
+# External library imports
+import pytest
+import reportlab
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph
+
+# Local imports
+from report_common.fonts import REPORT_FONTS, register_report_fonts
+from report_common.measure import clear_measure_cache, measure_cache_info, wrapped_height
+from report_common.reports import REPORT_TYPES
+from report_common.synthetic import make_payload
+
+# The widths the reports measure their wrapped cells at: the measured columns less their padding, and the summary box
+WIDTHS = [35.2859, 62.5718, 80.029, 84.2859, 98.5362, 152.5718, 320.029, 831.0898]
+
+# Cells picked to hit the line breaking rules: CJK, mixed latin and CJK, long unbroken tokens, spaces and empty cells
+CELLS = ["", " ", "   ", "水平1", "葡萄糖", "高密度脂蛋白胆固醇" * 4, "丙氨酸氨基转移酶(ALT)", "C反应蛋白 hs-CRP",
+         "糖化血红蛋白 HbA1c 糖化血红蛋白 HbA1c", "1-3s", "R-4s, 2-2s, 10x", "2023-03-05 10:00:00",
+         "重新测定质控品并校准仪器，结果在控。", "重新测定质控品并校准仪器" * 6, "A" * 80,
+         "Supercalifragilisticexpialidocious" * 3, "http://example.com/a/very/long/path/without/any/spaces/at/all",
+         "word " * 40, "trailing spaces   ", "  leading spaces", "中文English混合text排版", "（全角括号）、，。；：",
+         "!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!", "12345678901234567890123456789012345678901234567890",
+         "line one\nline two", "tab\tseparated", "张三丰张三丰", "已处理"]
+
+
+def _payload_cells():
+    """
+    The text of the payloads of every report type, as found in their cells
+    """
+    cells = set()
+
+    def walk(value):
+        if isinstance(value, str):
+            cells.add(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    for report_type in REPORT_TYPES:
+        for name_length in (1, 3):
+            walk(make_payload(report_type, seed=name_length, analytes=16, name_length=name_length))
+    return sorted(cells)
+
+
+def _fonts():
+    """
+    The fonts to measure with: the report fonts when they are found like the reports look them up, and a font shipped
+    with reportlab, so the test always runs
+    """
+    fonts = []
+    try:
+        register_report_fonts()
+        fonts.append(next(iter(REPORT_FONTS)))
+    except Exception:
+        pass
+
+    if "TestVera" not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont("TestVera", os.path.join(os.path.dirname(reportlab.__file__), "fonts",
+                                                                "Vera.ttf")))
+    fonts.append("TestVera")
+    return fonts
+
+
+@pytest.fixture(scope="module", params=_fonts())
+def style(request):
+    return ParagraphStyle(name=f"Measure{request.param}", fontName=request.param, fontSize=9, textColor="black",
+                          wordWrap="CJK", leading=12, alignment=0)
+
+
+@pytest.mark.parametrize("width", WIDTHS)
+def test_line_counts_match_paragraph_wrap(style, width):
+    clear_measure_cache()
+    for text in CELLS + _payload_cells():
+        expected = Paragraph(text, style).wrap(width, 0)[1]
+        assert wrapped_height(text, width, style) == expected, text
+        assert wrapped_height(text, width, style) / style.leading == round(expected / style.leading), text
+
+
+def test_markup_goes_through_paragraph(style):
+    clear_measure_cache()
+    for text in ["<b>粗体</b>文本" * 5, "a &amp; b " * 20, "<br/>两行"]:
+        assert wrapped_height(text, 62.5718, style) == Paragraph(text, style).wrap(62.5718, 0)[1]
+
+
+def test_repeated_cells_are_measured_once(style):
+    clear_measure_cache()
+    for _ in range(3):
+        for text in CELLS:
+            wrapped_height(text, 80.029, style)
+    info = measure_cache_info()
+    assert info.misses == len(set(CELLS))
+    assert info.hits == 2 * len(CELLS) + len(CELLS) - len(set(CELLS))
@@ -0,0 +1,239 @@
+# Standard library imports
+import io
+import random
+
+# External library imports
+import pytest
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfgen import canvas
+from reportlab.platypus import TableStyle
+
+# Local imports
+from report_common.layout import TableSpec, draw_table, paginate
+from report_common.pagination import RowIndex, fit_pages
+
+CELL_Y = 19
+
+# The thresholds of the report types: first_page_rows, one_page_lines and last_page_lines
+THRESHOLDS = {
+    "cv": (20, 15, 25),
+    "stats": (20, 15, 24),
+    "grouped": (21, 19, 29),
+}
+
+
+def _baseline_fit(heights, lines):
+    """
+    The number of rows fitting in a number of lines, scanned row by row like the baseline loop. A row taller than the
+    page goes on a page of its own
+    """
+    total = count = 0
+    for height in heights:
+        if total + height > lines * CELL_Y:
+            break
+        total += height
+        count += 1
+    return max(count, 1) if heights else 0
+
+
+def _baseline_pages(heights, first_page_rows, one_page_lines, last_page_lines, header_rows=0, page_rows=30):
+    """
+    The page breaks of the loop the reports used before the layout engine: the first page, full pages as long as the
+    rest doesn't fit on the last page, then the last page
+    :return: whether the table shares the first page with the summary, and the index one past the last row of every
+    page
+    """
+    one_page = sum(heights) / CELL_Y <= one_page_lines - header_rows
+    breaks = [_baseline_fit(heights, first_page_rows - header_rows)]
+    while breaks[-1] < len(heights) and sum(heights[breaks[-1]:]) / CELL_Y > last_page_lines:
+        breaks.append(breaks[-1] + _baseline_fit(heights[breaks[-1]:], page_rows))
+    if breaks[-1] < len(heights):
+        breaks.append(len(heights))
+    return one_page, breaks
+
+
+def _baseline_spans(labels):
+    """
+    The group sizes of the rows of a page, like the baseline _row_span_calc. The first row always starts a group
+    """
+    spans = []
+    for i, label in enumerate(labels):
+        if i == 0 or label:
+            spans.append(0)
+        spans[-1] += 1
+    return spans
+
+
+class _HeightSpec(TableSpec):
+    """
+    A table whose rows are [label, height], measured from the height cell instead of the fonts
+    """
+
+    def measure_row(self, row):
+        return row[1], None
+
+
+def _height_spec(thresholds, grouped=False, page_styler=None):
+    first_page_rows, one_page_lines, last_page_lines = thresholds
+    return _HeightSpec(100, TableStyle([]), ParagraphStyle("test"), measured_cols=[(0, 100)], wrapped_cols=(),
+                       grouped=grouped, first_page_rows=first_page_rows, one_page_lines=one_page_lines,
+                       last_page_lines=last_page_lines, page_styler=page_styler)
+
+
+def _draw_pages(heights, labels, thresholds, header_rows=0):
+    """
+    Draws a table with the layout engine and records its pages
+    :return: whether the table shares the first page with the summary, the index one past the last row of every page,
+    and the row heights handed to every page table
+    """
+    pages = []
+    spec = _height_spec(thresholds, labels is not None, lambda table, page: pages.append(page))
+
+    rows = [[label, height] for label, height in zip(labels or [""] * len(heights), heights)]
+    pdf = canvas.Canvas(io.BytesIO())
+    draw_table(pdf, spec, iter(rows), (10, 10, 800, 580), 500, header_rows)
+
+    # Only the pages after the first one are started by draw_table, the summary page is started by the report
+    one_page = pdf.getPageNumber() == 1 and len(pages) == 1
+    heights = [page.row_index.row_heights(page.start, page.stop) for page in pages]
+    return one_page, [page.stop for page in pages], heights
+
+
+def _random_heights(rng, n_rows):
+    """
+    Row heights in the mix of the reports: mostly single lines, some wrapped labels of 2 to 4 lines of 12 points
+    """
+    return [CELL_Y if rng.random() < 0.8 else 12 * rng.randint(2, 4) for _ in range(n_rows)]
+
+
+def test_fit_pages_first_page_budget():
+    heights = [CELL_Y] * 50
+    assert fit_pages(heights, 30 * CELL_Y, 20 * CELL_Y) == [20, 50]
+    assert fit_pages(heights, 30 * CELL_Y) == [30, 50]
+
+
+def test_fit_pages_exact_fit_stays_on_the_page():
+    assert fit_pages([CELL_Y] * 4, 2 * CELL_Y) == [2, 4]
+    assert fit_pages([CELL_Y, 2 * CELL_Y + 1, CELL_Y], 3 * CELL_Y) == [1, 2, 3]
+
+
+def test_fit_pages_oversized_row_gets_a_page_of_its_own():
+    heights = [CELL_Y, 40 * CELL_Y, CELL_Y, CELL_Y]
+    assert fit_pages(heights, 30 * CELL_Y) == [1, 2, 4]
+    assert fit_pages([40 * CELL_Y], 30 * CELL_Y, 20 * CELL_Y) == [1]
+
+
+def test_fit_pages_empty():
+    assert fit_pages([], 30 * CELL_Y) == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fit_pages_match_baseline_scan(seed):
+    rng = random.Random(seed)
+    heights = _random_heights(rng, rng.randint(1, 200))
+
+    expected = [_baseline_fit(heights, 20)]
+    while expected[-1] < len(heights):
+        expected.append(expected[-1] + _baseline_fit(heights[expected[-1]:], 30))
+    assert fit_pages(heights, 30 * CELL_Y, 20 * CELL_Y) == expected
+
+
+def test_row_index_offset():
+    labels = ["", "", "a", "", "b", "", "", "", "", ""]
+    row_index = RowIndex([CELL_Y] * 10, labels=labels, offset=40)
+    assert row_index.row_heights(48, 50) == [CELL_Y / 2, CELL_Y / 2]
+    assert row_index.group_spans(40, 50) == [2, 2, 6]
+    assert row_index.total_height == 10 * CELL_Y
+
+
+def test_group_spans_over_page_breaks():
+    labels = ["a", "", "", "b", "", "c", "", "", ""]
+    row_index = RowIndex([CELL_Y] * len(labels), labels=labels)
+
+    # A group continued from the previous page is a group of its own
+    for start, stop in [(0, 9), (0, 2), (2, 5), (4, 7), (7, 9)]:
+        assert row_index.group_spans(start, stop) == _baseline_spans(labels[start:stop])
+    assert row_index.group_spans(3, 3) == []
+
+
+def test_group_label_height_spread_over_the_page_rows():
+    labels = ["a", "", "", "b"]
+    row_index = RowIndex([60, CELL_Y, CELL_Y, CELL_Y], labels=labels)
+
+    # The wrapped label of a is shared by its rows, the continued group keeps the height of its first row
+    assert row_index.row_heights(0, 3) == [20, 20, 20]
+    assert row_index.row_heights(1, 4) == [CELL_Y / 2, CELL_Y / 2, CELL_Y]
+
+    # The other measured cells are never shrunk by the spread
+    row_index = RowIndex([60, CELL_Y, CELL_Y], [CELL_Y, 36, CELL_Y], labels=["a", "", ""])
+    assert row_index.row_heights(0, 3) == [20, 36, 20]
+
+
+@pytest.mark.parametrize("n_rows, one_page, kinds", [
+    (10, True, ["first"]),
+    (18, False, ["first"]),
+    (40, False, ["first", "last"]),
+    (50, False, ["first", "full"]),
+    (70, False, ["first", "full", "last"]),
+    (80, False, ["first", "full", "full"]),
+])
+def test_paginate_pulls_rows_page_by_page(n_rows, one_page, kinds):
+    pulled = []
+
+    def rows():
+        for number in range(n_rows):
+            pulled.append(number)
+            yield ["", CELL_Y]
+
+    shared, pages = paginate(_height_spec(THRESHOLDS["cv"]), rows())
+    assert shared == one_page
+    laid_out = []
+    for kind, page in pages:
+        # The rows of a page are pulled, and at most a page of rows after it
+        assert len(pulled) <= page.stop + 30
+        laid_out.append(kind)
+    assert laid_out == kinds
+
+
+@pytest.mark.parametrize("report", THRESHOLDS)
+@pytest.mark.parametrize("n_rows", [1, 14, 15, 16, 20, 21, 44, 45, 46, 50, 74, 75, 76])
+def test_one_page_and_last_page_thresholds(report, n_rows):
+    heights = [CELL_Y] * n_rows
+    assert _draw_pages(heights, None, THRESHOLDS[report])[:2] == _baseline_pages(heights, *THRESHOLDS[report])
+
+
+@pytest.mark.parametrize("header_rows", [0, 1, 2])
+def test_first_page_loses_the_header_rows(header_rows):
+    heights = [CELL_Y] * 40
+    one_page, breaks, _ = _draw_pages(heights, None, THRESHOLDS["cv"], header_rows)
+    assert breaks[0] == 20 - header_rows
+    assert (one_page, breaks) == _baseline_pages(heights, *THRESHOLDS["cv"], header_rows=header_rows)
+
+
+def test_oversized_rows_get_a_page_of_their_own():
+    heights = [CELL_Y] * 5 + [40 * CELL_Y] + [CELL_Y] * 40 + [35 * CELL_Y]
+    one_page, breaks, _ = _draw_pages(heights, None, THRESHOLDS["cv"])
+    assert breaks == [5, 6, 36, 46, 47]
+    assert (one_page, breaks) == _baseline_pages(heights, *THRESHOLDS["cv"])
+
+    # An oversized first row still starts the table below the header
+    assert _draw_pages([40 * CELL_Y, CELL_Y], None, THRESHOLDS["cv"])[:2] == (False, [1, 2])
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("report", THRESHOLDS)
+def test_draw_table_matches_baseline_loop(report, seed):
+    rng = random.Random(seed)
+    heights = _random_heights(rng, rng.randint(1, 150))
+    labels = [f"analyte {i}" if i == 0 or rng.random() < 0.3 else "" for i in range(len(heights))]
+    header_rows = rng.randint(0, 2)
+
+    one_page, breaks, page_heights = _draw_pages(heights, labels, THRESHOLDS[report], header_rows)
+    assert (one_page, breaks) == _baseline_pages(heights, *THRESHOLDS[report], header_rows=header_rows)
+
+    # Every page spreads the label heights over the groups of that page only
+    for start, stop, row_heights in zip([0] + breaks, breaks, page_heights):
+        spread = []
+        for span in _baseline_spans(labels[start:stop]):
+            spread.extend([heights[start + len(spread)] / span] * span)
+        assert row_heights == spread
@@ -0,0 +1,113 @@
+# Standard library imports
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+# External library imports
+import pytest
+
+# Local imports
+from report_common.service import RenderService, _PayloadError, _render_job, make_server
+
+
+class _Service:
+    """
+    Stands in for the pool of workers, answering every render with the given result or error
+    """
+    storage_dir = None
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.bodies = []
+
+    def render(self, report_type, body, store=False):
+        self.bodies.append(body)
+        if isinstance(self.outcome, BaseException):
+            raise self.outcome
+        return self.outcome
+
+    def ready(self):
+        return True
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(service):
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server.server_address[1]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _post(port, headers, body=b""):
+    """
+    Sends a raw render request
+    :return: the status and the json content of the response
+    """
+    request = b"POST /render/cv HTTP/1.1\r\nHost: localhost\r\n" + b"".join(header + b"\r\n" for header in headers)
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as conn:
+        conn.sendall(request + b"\r\n" + body)
+        response = b""
+        while chunk := conn.recv(65536):
+            response += chunk
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content)
+
+
+@pytest.mark.parametrize("headers, status", [
+    ([], 411),
+    ([b"Content-Length: abc"], 400),
+    ([b"Content-Length: -1"], 400),
+    ([b"Content-Length: 1.5"], 400),
+    ([b"Content-Length: \xb2"], 400),
+])
+def test_content_length_is_checked_before_the_body_is_read(serve, headers, status):
+    service = _Service({"key": "never"})
+    assert _post(serve(service), headers, b"{}")[0] == status
+    assert service.bodies == []
+
+
+@pytest.mark.parametrize("outcome, status", [
+    (_PayloadError("JSONDecodeError: Expecting value"), 422),
+    (TimeoutError(), 504),
+    (BrokenProcessPool("a worker died"), 503),
+    (KeyError("cvDataList"), 500),
+    (None, 503),
+])
+def test_failures_map_to_their_status(serve, outcome, status):
+    service = _Service(outcome)
+    assert _post(serve(service), [b"Content-Length: 2"], b"{}")[0] == status
+    assert service.bodies == [b"{}"]
+
+
+@pytest.mark.parametrize("body", [b"{", b"[]", b"\xff{}", b""])
+def test_unreadable_payloads_are_payload_errors(body):
+    with pytest.raises(_PayloadError):
+        _render_job("cv", body)
+
+
+def test_a_broken_pool_is_never_ready_again():
+    service = RenderService(workers=1, queue_size=4, timeout=30)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            service._executor.submit(os._exit, 1).result(30)
+        deadline = time.monotonic() + 30
+        while service.ready() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert service.broken() and not service.ready()
+        with pytest.raises(BrokenProcessPool):
+            service.render("cv", b"{}")
+        assert not service.ready()
+    finally:
+        service.shutdown()